@@ -12,5 +12,9 @@ setuptools.setup(
         "numpy==1.19.4",
         "pandas==1.2.0",
         "reportlab==3.5.57",
-    ]
+    ],
+    extras_require={
+        # Feather-cache av tabellene, se cybajour.util.TableCache.
+        "cache": ["pyarrow>=3.0.0"],
+    },
 )
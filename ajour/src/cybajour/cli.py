@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 from cmd import Cmd
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime, date as ddate, timedelta
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 import colorama
-from pandas import DataFrame
+from pandas import DataFrame, Timedelta, Timestamp
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import mm
@@ -26,6 +27,7 @@ from cybajour.datasets import (
     ZrapportLinje
 )
 from cybajour.util import DatabaseCollection, find_latest_datadir
+from cybajour.warehouse import WAREHOUSE_FILE, Warehouse
 
 
 def create_pdf(path: Path, data: str) -> None:
@@ -60,17 +62,118 @@ class BColors:
     UNDERLINE = '\033[4m'
 
 
+# Tabeller som lastes samtidig når databasen velges, de største først.
+# Dette er alle som benyttes av dato og rapport.
+PRELOAD = (
+    Salgslinje,
+    Betaling,
+    Kvittering,
+    ZrapportLinje,
+    Faktura,
+    Journal,
+    Zrapport,
+    Varegruppe,
+    Kunde,
+)
+
+
+def load_dataset(clz, dbcol: DatabaseCollection) -> DataFrame:
+    return clz(dbcol).df()
+
+
 class DfCache:
-    def __init__(self, dbcol: DatabaseCollection):
+    def __init__(self, dbcol: DatabaseCollection, warehouse: Optional[Warehouse] = None):
         self.dbcol = dbcol
+        self.warehouse = warehouse
         self._cache = {}
+        self._sorted = {}
+        self._pending: Dict[str, Future] = {}
+        self._last_ids: Optional[Dict[str, int]] = None
+
+    def use_warehouse(self, warehouse: Warehouse):
+        self.warehouse = warehouse
+        self._last_ids = None
+
+    def preload(self, classes, max_workers: Optional[int] = None):
+        """
+        Start lasting av tabellene i en prosesspool, slik at mdb-export og
+        parsing av CSV kjører på alle kjerner. memoize venter på resultatet
+        dersom det ikke er klart.
+
+        Arbeiderne skriver kun sine egne tabellfiler i cachen. MDB-filene
+        hashes én gang her, og fingeravtrykkene følger med dbcol.
+        """
+        self.dbcol.fingerprint_all()
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        for clz in classes:
+            name = clz.__name__
+            if self._from_warehouse(clz):
+                continue
+            if name not in self._cache and name not in self._pending:
+                self._pending[name] = executor.submit(load_dataset, clz, self.dbcol)
+        executor.shutdown(wait=False)
 
     def memoize(self, clz) -> DataFrame:
         name = clz.__name__
         if name not in self._cache:
-            self._cache[name] = clz(self.dbcol).df()
+            df = None
+            future = self._pending.pop(name, None)
+            if future is not None:
+                try:
+                    df = future.result()
+                except Exception as e:
+                    print("Forhåndslasting av {} feilet, prøver igjen: {}".format(name, e))
+            if df is None:
+                df = load_dataset(clz, self.dbcol)
+            self._cache[name] = df
         return self._cache[name]
 
+    def _memoize_sorted(self, clz) -> DataFrame:
+        """Tabellen for clz sortert på date_column, for binærsøk i between."""
+        name = clz.__name__
+        if name not in self._sorted:
+            df = self.memoize(clz)
+            dates = df[clz.date_column]
+            if dates.hasnans:
+                # Rader uten dato er aldri med i et datointervall.
+                df = df[dates.notna()]
+            if not df[clz.date_column].is_monotonic_increasing:
+                df = df.sort_values(clz.date_column, kind="mergesort")
+            self._sorted[name] = df
+        return self._sorted[name]
+
+    def _warehouse_last_id(self, clz) -> Optional[int]:
+        """
+        Høyeste id i datamappen for tabellen i lageret, eller None om
+        tabellen ikke er lest inn fra datamappen.
+        """
+        if self.warehouse is None or not self.warehouse.has_table(clz):
+            return None
+        if self._last_ids is None:
+            self._last_ids = self.warehouse.last_ids(self.dbcol.path.name)
+        return self._last_ids.get(clz.__name__)
+
+    def _from_warehouse(self, clz) -> bool:
+        return self._warehouse_last_id(clz) is not None
+
+    def between(self, clz, first: Timestamp, last: Timestamp) -> DataFrame:
+        """
+        Radene med first <= date_column <= last, som et utsnitt av den
+        sorterte tabellen. Utsnittet må kopieres før det endres.
+
+        Er datamappen lest inn i lageret, hentes radene derfra uten å
+        lese tabellen fra MDB-filene.
+        """
+        last_id = self._warehouse_last_id(clz)
+        if last_id is not None:
+            return self.warehouse.between(clz, first, last, last_id)
+
+        df = self._memoize_sorted(clz)
+        dates = df[clz.date_column]
+        lo = dates.searchsorted(first, side="left")
+        hi = dates.searchsorted(last, side="right")
+        return df.iloc[lo:hi]
+
 
 class Rapport:
     def __init__(self, dfcache: DfCache, dato_start: ddate = None, dato_slutt: ddate = None):
@@ -82,29 +185,20 @@ class Rapport:
     def memoize(self, clz) -> DataFrame:
         name = clz.__name__
         if name not in self._cache:
-            df = self.dfcache.memoize(clz)
-
             if self.dato_start is not None and self.dato_slutt is not None:
-                dato_start_str = str(self.dato_start)
-                dato_slutt_str = str(self.dato_slutt)
-
-                if name == Kvittering.__name__:
-                    df = df[(df["dato"] >= dato_start_str) & (df["dato"] <= dato_slutt_str)].copy()
-                elif name == Betaling.__name__:
-                    df = df[(df["dato"] >= dato_start_str) & (df["dato"] <= dato_slutt_str)].copy()
-                elif name == Salgslinje.__name__:
-                    df = df[(df["dato"] >= dato_start_str) & (df["dato"] <= dato_slutt_str)].copy()
-                elif name == Faktura.__name__:
-                    df = df[(df["dato"] >= dato_start_str) & (df["dato"] <= dato_slutt_str)].copy()
-                elif name == Journal.__name__:
-                    df = df[(df["tid_registrert"].dt.date >= self.dato_start) & (df["tid_registrert"].dt.date <= self.dato_slutt + timedelta(days=1))].copy()
-                elif name == Zrapport.__name__:
-                    df = df[(df["dato"] >= dato_start_str) & (df["dato"] <= dato_slutt_str)].copy()
-                elif name == ZrapportLinje.__name__:
-                    df = df[(df["dato"] >= dato_start_str) & (df["dato"] <= dato_slutt_str)].copy()
-                else:
+                if clz.date_column is None:
                     raise ValueError("Ukjent: {}".format(name))
 
+                first = Timestamp(self.dato_start)
+                last = Timestamp(self.dato_slutt)
+                if clz is Journal:
+                    # Hele dagen etter dato_slutt.
+                    last = Timestamp(self.dato_slutt + timedelta(days=2)) - Timedelta(1, "ns")
+
+                df = self.dfcache.between(clz, first, last).copy()
+            else:
+                df = self.dfcache.memoize(clz)
+
             self._cache[name] = df
 
         return self._cache[name]
@@ -283,6 +377,7 @@ class PromptHelper:
         print("--------------------------------------------------------------------------------")
         print("  db            Sett database til nyeste funnet")
         print("  db <name>     Sett database til angitt mappenavn")
+        print("                Tabellene lastes i bakgrunnen")
         print("  z <dato>      Vis oppgjør for dato yyyy-mm-dd")
         print("  z <nr>        Vis oppgjør med angitt nr")
         print("  dato <dato>   Vis informasjon om dato")
@@ -297,6 +392,8 @@ class PromptHelper:
         print("  varer         Vis alle varer")
         print("  journal       Vis alle oppføringer fra journal")
         print("  kunder        Vis alle kunder")
+        print("  lager         Les nye rader fra nyere mapper i data/ inn i lageret")
+        print("                Rapporter for en innlest mappe henter salg fra lageret")
         print("  quit          Avslutt (evt. trykk Ctrl+D)")
         print("")
         print("Trykk enter for å se hjelp")
@@ -318,10 +415,17 @@ class MyPrompt(Cmd):
             print(str(e))
             return
 
+        if datadir is None:
+            return
+
         print("Data dir: " + str(datadir))
 
+        warehouse_file = datadir.parent / WAREHOUSE_FILE
+        warehouse = Warehouse(warehouse_file) if warehouse_file.exists() else None
+
         self.dbcol = DatabaseCollection(path=datadir)
-        self.dfcache = DfCache(self.dbcol)
+        self.dfcache = DfCache(self.dbcol, warehouse)
+        self.dfcache.preload(PRELOAD)
 
     def do_z(self, args):
         if not self.check_dbcol():
@@ -499,6 +603,23 @@ class MyPrompt(Cmd):
         journal_df = journal_df.sort_values(by="tid_registrert")
         print(journal_df.to_string())
 
+    def do_lager(self, args):
+        base = Path.cwd() / "data"
+        warehouse = Warehouse(base / WAREHOUSE_FILE)
+
+        pending = warehouse.pending(base)
+        if len(pending) == 0:
+            print("Ingen nye mapper i '{}'".format(base))
+            return
+
+        for datadir in pending:
+            print("Leser inn " + datadir.name)
+            for name, rows in warehouse.ingest(datadir).items():
+                print("  {:15} {:10} nye rader".format(name, rows))
+
+        if self.dfcache is not None:
+            self.dfcache.use_warehouse(warehouse)
+
     def do_kunder(self, args):
         kunder_df = self.dfcache.memoize(Kunde)
         kunder_df = kunder_df.sort_values(by=Kunde.nr)
@@ -138,6 +138,7 @@ class Kvittering(DataSet):
     """
 
     nr = "kvittering_nr"
+    date_column = "dato"
 
     def __init__(self, dbcol: DatabaseCollection):
         super().__init__(dbcol, Database.CASHDATA, "Faklog", [
@@ -148,8 +149,8 @@ class Kvittering(DataSet):
             Col("KUNDEID", Kunde.nr),
             Col("IALT", "beloep_eks_mva"),
             Col("MOMS", "beloep_mva"),
-            Col("TYPE", "type"),  # FAKT, KRED, REKV
-            Col("IntRef", "bruker_navn"),
+            Col("TYPE", "type", "category"),  # FAKT, KRED, REKV
+            Col("IntRef", "bruker_navn", "category"),
             Col("Tidspunkt", TID_REGISTRERT),
             Col("Firma", "kunde_navn"),
         ])
@@ -201,6 +202,7 @@ class Betaling(DataSet):
     """
 
     id = "betaling_id"
+    date_column = "dato"
 
     def __init__(self, dbcol: DatabaseCollection):
         super().__init__(dbcol, Database.CASHDATA, "LogBetalingBon", [
@@ -217,9 +219,9 @@ class Betaling(DataSet):
             Col("BetDato", "bet_dato"),
             Col("Tidspunkt", TID_REGISTRERT),
             Col("Bordnr", "bord_nr"),
-            Col("Saelger", "selger_navn"),
+            Col("Saelger", "selger_navn", "category"),
             Col("KundeNr", Kunde.nr),
-            Col("LogType", "type"),
+            Col("LogType", "type", "category"),
         ])
 
     def df(self):
@@ -253,6 +255,7 @@ class Salgslinje(DataSet):
     """
 
     id = "salgslinje_id"
+    date_column = "dato"
 
     def __init__(self, dbcol: DatabaseCollection):
         super().__init__(dbcol, Database.CASHDATA, "Statistik", [
@@ -268,14 +271,15 @@ class Salgslinje(DataSet):
             Col("SALG1", "beloep_eks_mva_pr"),
             Col("MomsBelb", "beloep_mva"),
             Col("RabatBelb", "beloep_rabatt_inkl_mva"),
-            Col("TYPE", "type"),  # FAKT, KRED, REKV
+            Col("TYPE", "type", "category"),  # FAKT, KRED, REKV
             Col("Dato", "dato"),
             Col("SalgsDato", "salgsdato"),
             Col("UdskTid", TID_REGISTRERT),
             Col("KundeNr", Kunde.nr),
-            Col("Saelger", "selger_navn"),
+            Col("Saelger", "selger_navn", "category"),
+            # Ikke category, da groupby på kategorier gir alle kombinasjoner.
             Col("Bordnr", "bord_nr"),
-            Col("Kode", "kode"),  # 00, 02
+            Col("Kode", "kode", "category"),  # 00, 02
         ])
 
     def df(self):
@@ -356,6 +360,7 @@ class Faktura(DataSet):
 
     # faktura_nr er det samme som kvittering_nr?
     nr = "faktura_nr"
+    date_column = "dato"
 
     def __init__(self, dbcol: DatabaseCollection):
         super().__init__(dbcol, Database.CASHREGN, "OpostDebitor", [
@@ -392,13 +397,14 @@ class Journal(DataSet):
     """
 
     nr = "journal_nr"
+    date_column = TID_REGISTRERT
 
     def __init__(self, dbcol: DatabaseCollection):
         super().__init__(dbcol, Database.CASHREGN, "Journal", [
             Col("JournalID", Journal.nr),
-            Col("Navn", "navn"),
+            Col("Navn", "navn", "category"),
             Col("Dato", TID_REGISTRERT),
-            Col("JournalType", "type"),
+            Col("JournalType", "type", "category"),
         ])
 
 
@@ -419,6 +425,8 @@ class Zrapport(DataSet):
     Dataen som er i ZrapportLinje inneholder kun fakturatest utført.
     """
 
+    date_column = "dato"
+
     def __init__(self, dbcol: DatabaseCollection):
         super().__init__(dbcol, Database.CASHDATA, "OptaellingBon", [
             Col("Dato", "dato"),
@@ -456,6 +464,8 @@ class ZrapportLinje(DataSet):
     Se forklaring i Zrapport.
     """
 
+    date_column = "dato"
+
     def __init__(self, dbcol: DatabaseCollection):
         super().__init__(dbcol, Database.CASHREGN, "Finanstransaktion", [
             Col("Bilag", BILAG_NR),
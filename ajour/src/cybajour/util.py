@@ -1,10 +1,23 @@
+import hashlib
+import json
+import os
+import sys
 from enum import Enum
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pandas
 import pandas_access as mdb
 
+try:
+    # Needed for the table cache, see TableCache.
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+# Directory in each data directory for TableCache.
+CACHE_DIR = ".cybajour-cache"
+
 
 class Database(Enum):
     CASHREGN = "Cashregn.mdb"
@@ -13,25 +26,146 @@ class Database(Enum):
     MODULERX = "ModulerX.mdb"
 
 
+def remove_file(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class TableCache:
+    """
+    Feather-filer med resultatet av DataSet.df (før evt. behandling i
+    underklassene), i en mappe under datamappen.
+
+    Filene er nøklet på størrelse, mtime og SHA-256 av MDB-filen, så en
+    ny eller endret fil aldri gir gamle data. Hashen huskes i
+    fingerprints.json så lenge størrelse og mtime er uendret, slik at
+    MDB-filen ikke må leses på nytt hver gang. Bare prosessen som opprettet
+    cachen skriver fingerprints.json. Andre prosesser, som arbeiderne i
+    DfCache.preload, bruker fingeravtrykkene de arvet fra denne, se
+    DatabaseCollection.fingerprint_all.
+
+    Krever pyarrow (pip install -e ".[cache]").
+    """
+
+    def __init__(self, path: Path):
+        self.path = path / CACHE_DIR
+        self._owner = os.getpid()
+        # Fingeravtrykk kjent i denne prosessen: navn -> (størrelse, mtime, hash)
+        self._known: Dict[str, Tuple[int, int, str]] = {}
+
+    def _fingerprints_file(self) -> Path:
+        return self.path / "fingerprints.json"
+
+    def _read_fingerprints(self) -> dict:
+        try:
+            return json.loads(self._fingerprints_file().read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def fingerprint(self, mdb_file: Path) -> str:
+        stat = mdb_file.stat()
+        known = self._known.get(mdb_file.name)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return known[2]
+
+        fingerprints = self._read_fingerprints()
+        stored = fingerprints.get(mdb_file.name)
+        if stored is not None and stored["size"] == stat.st_size and stored["mtime_ns"] == stat.st_mtime_ns:
+            self._known[mdb_file.name] = (stat.st_size, stat.st_mtime_ns, stored["sha256"])
+            return stored["sha256"]
+
+        digest = hashlib.sha256()
+        with open(mdb_file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+        self._known[mdb_file.name] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+        if os.getpid() == self._owner:
+            fingerprints[mdb_file.name] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": digest.hexdigest(),
+            }
+            self.path.mkdir(exist_ok=True)
+            tmp_file = self._fingerprints_file().with_suffix(".tmp%d" % os.getpid())
+            tmp_file.write_text(json.dumps(fingerprints))
+            tmp_file.replace(self._fingerprints_file())
+
+        return digest.hexdigest()
+
+    def _file(self, prefix: str, mdb_file: Path) -> Path:
+        return self.path / "{}-{}.feather".format(prefix, self.fingerprint(mdb_file)[:16])
+
+    def load(self, prefix: str, mdb_file: Path) -> Optional[pandas.DataFrame]:
+        try:
+            return pandas.read_feather(self._file(prefix, mdb_file))
+        except FileNotFoundError:
+            return None
+
+    def store(self, prefix: str, mdb_file: Path, data: pandas.DataFrame):
+        self.path.mkdir(exist_ok=True)
+        path = self._file(prefix, mdb_file)
+        tmp_file = path.with_suffix(".tmp%d" % os.getpid())
+        try:
+            data.reset_index(drop=True).to_feather(tmp_file)
+        except Exception as e:
+            # F.eks. kolonner med blandede typer som Arrow ikke støtter.
+            print("Kan ikke mellomlagre {}: {}".format(prefix, e), file=sys.stderr)
+            remove_file(tmp_file)
+            return
+        tmp_file.replace(path)
+
+        # Fjern filer for tidligere versjoner av MDB-filen.
+        for old in self.path.glob("{}-*.feather".format(prefix)):
+            if old != path:
+                remove_file(old)
+
+
 class DatabaseCollection:
-    def __init__(self, path: Path = Path.cwd()):
+    def __init__(self, path: Path = Path.cwd(), cache: bool = True):
+        self.path = path
         self._paths = {
             Database.CASHREGN: path / Database.CASHREGN.value,
             Database.CASHDATA: path / Database.CASHDATA.value,
             Database.DATAFLET: path / Database.DATAFLET.value,
         }
+        self.cache = TableCache(path) if cache and pyarrow is not None else None
 
     def __getitem__(self, database: Database):
         return self._paths[database]
 
+    def fingerprint_all(self):
+        """
+        Beregn fingeravtrykk for alle MDB-filene i denne prosessen, før
+        samlingen sendes til andre prosesser.
+        """
+        if self.cache is None:
+            return
+        for path in self._paths.values():
+            if path.exists():
+                self.cache.fingerprint(path)
+
 
 class Col:
-    def __init__(self, name: str, alias: str):
+    """
+    Kolonne som skal leses fra tabellen.
+
+    dtype overstyrer typen fra skjemaet i MDB-filen, f.eks. "category" for
+    tekstkolonner med få ulike verdier.
+    """
+
+    def __init__(self, name: str, alias: str, dtype: Optional[str] = None):
         self.name = name
         self.alias = alias
+        self.dtype = dtype
 
 
 class DataSet:
+    # Datokolonnen tabellen kan avgrenses på, se DfCache.between i cli.
+    date_column: Optional[str] = None
+
     def __init__(
         self,
         dbcol: DatabaseCollection,
@@ -44,13 +178,48 @@ class DataSet:
         self.tablename = tablename
         self.columns = columns
 
+    def _cache_prefix(self) -> str:
+        # Tabell og kolonner, så endringer i Col gir ny fil.
+        columns = json.dumps([(it.name, it.alias, it.dtype) for it in self.columns or []])
+        return "{}-{}-{}".format(
+            self.database.name,
+            self.tablename,
+            hashlib.sha256(columns.encode("utf-8")).hexdigest()[:8],
+        )
+
     def df(self):
+        cache = self.dbcol.cache
+        mdb_file = self.dbcol[self.database]
+        if cache is not None:
+            data = cache.load(self._cache_prefix(), mdb_file)
+            if data is not None:
+                return data
+
+        data = self._read()
+
+        if cache is not None:
+            cache.store(self._cache_prefix(), mdb_file, data)
+
+        return data
+
+    def _read(self):
+        # Kun kolonnene vi bruker parses, og med typene fra Col der
+        # disse er angitt. Øvrige typer kommer fra skjemaet.
+        kwargs = {}
+        if self.columns is not None:
+            kwargs["usecols"] = [it.name for it in self.columns]
+            dtypes = {it.name: it.dtype for it in self.columns if it.dtype is not None}
+            if dtypes:
+                kwargs["dtype"] = dtypes
+
         data = mdb.read_table(
             str(self.dbcol[self.database]),
-            self.tablename
+            self.tablename,
+            **kwargs
         )
 
         if self.columns is not None:
+            # usecols beholder rekkefølgen i tabellen.
             cols = [it.name for it in self.columns]
             data = data[cols]
 
@@ -0,0 +1,171 @@
+"""
+Lager med salgshistorikk på tvers av øyeblikksbildene i data/.
+
+Hvert øyeblikksbilde fra ajour-sync er en full kopi av MDB-filene. Ved
+innlesing legges kun rader med høyere id enn det som allerede finnes i
+lageret til, så lageret vokser kun. Endringer i eldre rader blir ikke med.
+
+Når den valgte datamappen er lest inn, henter DfCache.between tabellene
+herfra i stedet for å lese MDB-filene. Radene begrenses da til den høyeste
+id-en i datamappen, så en eldre mappe ikke får med rader fra nyere mapper.
+"""
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas
+from pandas import Timestamp
+
+from cybajour.datasets import Betaling, Kvittering, Salgslinje
+from cybajour.util import DatabaseCollection
+
+WAREHOUSE_FILE = "lager.sqlite"
+
+# Tabellene i lageret, med den stigende id-en nye rader finnes ut fra.
+TABLES = (
+    (Salgslinje, Salgslinje.id),
+    (Betaling, Betaling.id),
+    (Kvittering, Kvittering.nr),
+)
+
+SNAPSHOT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshot (
+    name TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    ingested TEXT NOT NULL,
+    -- Høyeste id i øyeblikksbildet, NULL om tabellen var tom.
+    last_id INTEGER,
+    PRIMARY KEY (name, table_name)
+)
+"""
+
+# Kolonnetypene fra DataSet.df, siden SQLite ikke har f.eks. category og bool.
+DTYPE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dtype (
+    table_name TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    PRIMARY KEY (table_name, column_name)
+)
+"""
+
+
+class Warehouse:
+    def __init__(self, path: Path):
+        self.path = path
+
+    def connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(str(self.path))
+        con.execute(SNAPSHOT_SCHEMA)
+        con.execute(DTYPE_SCHEMA)
+        return con
+
+    @staticmethod
+    def has_table(clz) -> bool:
+        return any(clz is it for it, _ in TABLES)
+
+    def last_ids(self, snapshot: str) -> Dict[str, int]:
+        """Høyeste id per tabell i snapshot, for tabellene som har rader."""
+        with closing(self.connect()) as con:
+            return {
+                row[0]: row[1]
+                for row in con.execute(
+                    "SELECT table_name, last_id FROM snapshot WHERE name = ? AND last_id IS NOT NULL",
+                    (snapshot,),
+                )
+            }
+
+    def ingested(self) -> List[str]:
+        with closing(self.connect()) as con:
+            return [row[0] for row in con.execute("SELECT DISTINCT name FROM snapshot ORDER BY name")]
+
+    def pending(self, base: Path) -> List[Path]:
+        """Øyeblikksbilder i base som er nyere enn det siste som er lest inn."""
+        ingested = self.ingested()
+        last = ingested[-1] if len(ingested) > 0 else ""
+        return [it for it in sorted(base.glob("*Z")) if it.is_dir() and it.name > last]
+
+    @staticmethod
+    def _max_id(con: sqlite3.Connection, table: str, column: str) -> Optional[int]:
+        try:
+            return con.execute('SELECT MAX(CAST("{}" AS INTEGER)) FROM "{}"'.format(column, table)).fetchone()[0]
+        except sqlite3.OperationalError:
+            # Tabellen er ikke opprettet ennå.
+            return None
+
+    def ingest(self, datadir: Path) -> Dict[str, int]:
+        """Legg til nye rader fra datadir, og returner antall per tabell."""
+        dbcol = DatabaseCollection(path=datadir)
+        return self.append(datadir.name, lambda clz: clz(dbcol).df())
+
+    def append(self, snapshot: str, load: Callable[[type], pandas.DataFrame]) -> Dict[str, int]:
+        """
+        Legg til radene fra load(clz) med høyere id enn lageret har fra før.
+
+        Hver tabell skrives for seg. Avbrytes innlesingen kan den kjøres på
+        nytt, da rader med id som allerede finnes hoppes over.
+        """
+        counts = {}
+        last_ids = {}
+        with closing(self.connect()) as con:
+            for clz, id_column in TABLES:
+                name = clz.__name__
+                df = load(clz)
+
+                ids = pandas.to_numeric(df[id_column])
+                last_ids[name] = None if len(df) == 0 else int(ids.max())
+
+                last = self._max_id(con, name, id_column)
+                if last is not None:
+                    df = df[ids > last]
+
+                with con:
+                    con.executemany("INSERT OR IGNORE INTO dtype VALUES (?, ?, ?)", [
+                        (name, column, str(dtype))
+                        for column, dtype in df.dtypes.items()
+                    ])
+                df.to_sql(name, con, if_exists="append", index=False)
+                con.execute('CREATE INDEX IF NOT EXISTS "{0}_{1}" ON "{0}" ("{1}")'.format(name, id_column))
+                con.execute('CREATE INDEX IF NOT EXISTS "{0}_{1}" ON "{0}" ("{1}")'.format(name, clz.date_column))
+                counts[name] = len(df)
+
+            with con:
+                con.executemany("INSERT OR REPLACE INTO snapshot VALUES (?, ?, ?, ?, ?)", [
+                    (snapshot, name, rows, datetime.now().isoformat(), last_ids[name])
+                    for name, rows in counts.items()
+                ])
+
+        return counts
+
+    def between(self, clz, first: Timestamp, last: Timestamp, last_id: Optional[int] = None) -> pandas.DataFrame:
+        """
+        Radene med first <= date_column <= last, sortert på date_column og
+        deretter rekkefølgen de ble lest inn i. Med last_id tas kun rader
+        med id <= last_id med.
+
+        Kolonnene får samme typer som i DataSet.df.
+        """
+        name = clz.__name__
+        id_column = dict(TABLES)[clz]
+        with closing(self.connect()) as con:
+            dtypes = dict(con.execute("SELECT column_name, dtype FROM dtype WHERE table_name = ?", (name,)).fetchall())
+
+            sql = 'SELECT * FROM "{0}" WHERE "{1}" >= ? AND "{1}" <= ?'.format(name, clz.date_column)
+            # Datoene lagres som tekst, f.eks. 2023-05-01 00:00:00.
+            params = [str(first), str(last)]
+            if last_id is not None:
+                sql += ' AND CAST("{}" AS INTEGER) <= ?'.format(id_column)
+                params.append(last_id)
+            sql += ' ORDER BY "{}", rowid'.format(clz.date_column)
+
+            df = pandas.read_sql_query(
+                sql,
+                con,
+                params=params,
+                parse_dates=[column for column, dtype in dtypes.items() if dtype.startswith("datetime64")],
+            )
+
+        return df.astype(dtypes)
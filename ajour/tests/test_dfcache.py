@@ -0,0 +1,98 @@
+import pandas
+from pandas import Timestamp
+
+from cybajour.cli import DfCache
+from cybajour.datasets import Betaling, Kvittering, Salgslinje
+from cybajour.util import DatabaseCollection
+from cybajour.warehouse import TABLES, Warehouse
+
+
+class Dated:
+    date_column = "dato"
+
+    def __init__(self, dbcol):
+        pass
+
+    def df(self):
+        return pandas.DataFrame({
+            "dato": pandas.to_datetime(["2023-05-02 00:00", None, "2023-05-01 00:00", "2023-05-03 00:00", "2023-05-01 10:00"]),
+            "nr": [0, 1, 2, 3, 4],
+        })
+
+
+class TestDfCache:
+    def test_between(self):
+        cache = DfCache(None)
+        df = cache.memoize(Dated)
+
+        assert list(cache.between(Dated, Timestamp("2023-05-01"), Timestamp("2023-05-02"))["nr"]) == [2, 4, 0]
+        assert list(cache.between(Dated, Timestamp("2023-05-04"), Timestamp("2023-05-05"))["nr"]) == []
+
+        # memoize keeps the table as loaded.
+        assert cache.memoize(Dated) is df
+        assert list(df["nr"]) == [0, 1, 2, 3, 4]
+
+    def test_between_from_warehouse(self, tmp_path):
+        warehouse = Warehouse(tmp_path / "lager.sqlite")
+        id_columns = dict(TABLES)
+        warehouse.append(
+            "20230502T000000Z",
+            lambda clz: pandas.DataFrame({id_columns[clz]: [1], "dato": pandas.to_datetime(["2023-05-01 00:00"])}),
+        )
+
+        # No MDB files in the data directory, so the rows must come from the warehouse.
+        cache = DfCache(DatabaseCollection(path=tmp_path / "20230502T000000Z"), warehouse)
+        df = cache.between(Salgslinje, Timestamp("2023-05-01"), Timestamp("2023-05-01"))
+        assert list(df[Salgslinje.id]) == [1]
+
+    def test_between_older_snapshot(self, tmp_path):
+        warehouse = Warehouse(tmp_path / "lager.sqlite")
+        id_columns = dict(TABLES)
+        for name, ids in (("20230502T000000Z", [1]), ("20230503T000000Z", [1, 2])):
+            warehouse.append(name, lambda clz: pandas.DataFrame({
+                id_columns[clz]: ids,
+                "dato": pandas.to_datetime(["2023-05-01 00:00"] * len(ids)),
+            }))
+
+        cache = DfCache(DatabaseCollection(path=tmp_path / "20230502T000000Z"), warehouse)
+        df = cache.between(Salgslinje, Timestamp("2023-05-01"), Timestamp("2023-05-01"))
+        assert list(df[Salgslinje.id]) == [1]
+
+    def test_warehouse_matches_mdb(self, tmp_path, monkeypatch):
+        salgslinje = pandas.DataFrame({
+            Salgslinje.id: [3, 1, 2, 4],
+            "type": pandas.Series(["FAKT", "KRED", "FAKT", None], dtype="category"),
+            "dato": pandas.to_datetime(["2023-05-02 00:00", "2023-05-01 00:00", "2023-05-01 00:00", None]),
+            "selger_navn": pandas.Series(["Ola", "Kari", None, "Ola"], dtype="category"),
+            "antall": [1.0, -2.0, None, 1.0],
+            "bord_nr": ["V1", None, "3", "4"],
+        })
+        betaling = pandas.DataFrame({
+            Betaling.id: [1, 2],
+            "er_kredit": [True, False],
+            "dato": pandas.to_datetime(["2023-05-01 00:00", "2023-05-02 00:00"]),
+            "selger_navn": pandas.Series(["Ola", "Kari"], dtype="category"),
+        })
+        kvittering = pandas.DataFrame({
+            Kvittering.nr: [50000],
+            "type": pandas.Series(["FAKT"], dtype="category"),
+            "bruker_navn": pandas.Series(["Ola"], dtype="category"),
+            "dato": pandas.to_datetime(["2023-05-01 00:00"]),
+        })
+        frames = {Salgslinje: salgslinje, Betaling: betaling, Kvittering: kvittering}
+        for clz, df in frames.items():
+            monkeypatch.setattr(clz, "df", lambda self, df=df: df.copy())
+
+        warehouse = Warehouse(tmp_path / "lager.sqlite")
+        datadir = tmp_path / "20230502T000000Z"
+        warehouse.ingest(datadir)
+
+        first, last = Timestamp("2023-05-01"), Timestamp("2023-05-02")
+        mdb = DfCache(DatabaseCollection(path=datadir, cache=False))
+        lager = DfCache(DatabaseCollection(path=datadir, cache=False), warehouse)
+        for clz in frames:
+            assert lager._from_warehouse(clz)
+            pandas.testing.assert_frame_equal(
+                lager.between(clz, first, last),
+                mdb.between(clz, first, last).reset_index(drop=True),
+            )
@@ -0,0 +1,85 @@
+import pandas
+from pandas import Timestamp
+
+from cybajour.datasets import Betaling, Salgslinje
+from cybajour.warehouse import TABLES, Warehouse
+
+
+def snapshot(ids, dates):
+    """load for Warehouse.append, with the same rows in every table."""
+    def load(clz):
+        return pandas.DataFrame({
+            dict(TABLES)[clz]: ids,
+            "dato": pandas.to_datetime(dates),
+            "tekst": ["linje %d" % it for it in ids],
+        })
+    return load
+
+
+class TestWarehouse:
+    def test_append_only_new_ids(self, tmp_path):
+        warehouse = Warehouse(tmp_path / "lager.sqlite")
+
+        first = snapshot([1, 2], ["2023-05-01 00:00", "2023-05-02 00:00"])
+        assert warehouse.append("20230502T000000Z", first) == {"Salgslinje": 2, "Betaling": 2, "Kvittering": 2}
+
+        # Row 2 is changed in the next snapshot, but only id 3 is new.
+        second = snapshot([1, 2, 3], ["2023-05-01 00:00", "2023-04-01 00:00", "2023-05-03 00:00"])
+        assert warehouse.append("20230503T000000Z", second) == {"Salgslinje": 1, "Betaling": 1, "Kvittering": 1}
+        assert warehouse.append("20230503T000000Z", second) == {"Salgslinje": 0, "Betaling": 0, "Kvittering": 0}
+
+        df = warehouse.between(Salgslinje, Timestamp("2023-01-01"), Timestamp("2023-12-31"))
+        assert list(df[Salgslinje.id]) == [1, 2, 3]
+        assert warehouse.ingested() == ["20230502T000000Z", "20230503T000000Z"]
+
+    def test_between(self, tmp_path):
+        warehouse = Warehouse(tmp_path / "lager.sqlite")
+        warehouse.append("20230504T000000Z", snapshot([3, 1, 2], ["2023-05-03 00:00", "2023-05-01 00:00", "2023-05-02 00:00"]))
+
+        df = warehouse.between(Betaling, Timestamp("2023-05-01"), Timestamp("2023-05-02"))
+        assert list(df[Betaling.id]) == [1, 2]
+        assert list(df["dato"]) == [Timestamp("2023-05-01"), Timestamp("2023-05-02")]
+        assert list(df["tekst"]) == ["linje 1", "linje 2"]
+
+    def test_last_ids(self, tmp_path):
+        warehouse = Warehouse(tmp_path / "lager.sqlite")
+        warehouse.append("20230504T000000Z", snapshot([1, 2], ["2023-05-01 00:00", "2023-05-02 00:00"]))
+        warehouse.append("20230505T000000Z", snapshot([], []))
+
+        assert warehouse.last_ids("20230504T000000Z") == {"Salgslinje": 2, "Betaling": 2, "Kvittering": 2}
+        # Empty tables are not read from the warehouse.
+        assert warehouse.last_ids("20230505T000000Z") == {}
+        assert warehouse.last_ids("20230506T000000Z") == {}
+
+    def test_between_last_id(self, tmp_path):
+        warehouse = Warehouse(tmp_path / "lager.sqlite")
+        warehouse.append("20230502T000000Z", snapshot([1, 2], ["2023-05-01 00:00", "2023-05-02 00:00"]))
+        warehouse.append("20230503T000000Z", snapshot([1, 2, 3], ["2023-05-01 00:00", "2023-05-02 00:00", "2023-05-02 00:00"]))
+
+        df = warehouse.between(Salgslinje, Timestamp("2023-05-01"), Timestamp("2023-05-02"), last_id=2)
+        assert list(df[Salgslinje.id]) == [1, 2]
+        df = warehouse.between(Salgslinje, Timestamp("2023-05-01"), Timestamp("2023-05-02"))
+        assert list(df[Salgslinje.id]) == [1, 2, 3]
+
+    def test_between_keeps_dtypes(self, tmp_path):
+        df = pandas.DataFrame({
+            Betaling.id: [1, 2, 3],
+            "dato": pandas.to_datetime(["2023-05-01 00:00", "2023-05-01 00:00", "2023-05-02 00:00"]),
+            "er_kredit": [True, False, True],
+            "selger_navn": pandas.Series(["Ola", None, "Kari"], dtype="category"),
+            "beloep_betalt": [10.5, None, 3.0],
+            "bord_nr": ["V1", None, "2"],
+        })
+        warehouse = Warehouse(tmp_path / "lager.sqlite")
+        warehouse.append("20230502T000000Z", lambda clz: df.rename(columns={Betaling.id: dict(TABLES)[clz]}))
+
+        result = warehouse.between(Betaling, Timestamp("2023-05-01"), Timestamp("2023-05-02"))
+        pandas.testing.assert_frame_equal(result, df)
+
+    def test_pending(self, tmp_path):
+        for name in ("20230501T000000Z", "20230502T000000Z", "20230503T000000Z"):
+            (tmp_path / name).mkdir()
+        warehouse = Warehouse(tmp_path / "lager.sqlite")
+        warehouse.append("20230502T000000Z", snapshot([1], ["2023-05-01 00:00"]))
+
+        assert [it.name for it in warehouse.pending(tmp_path)] == ["20230503T000000Z"]
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark of the posting page decoders.
+
+Decodes one /ledger/posting page and converts it to Posting objects with
+each available decoder. Uses a recorded page if given, e.g. saved with
+
+    curl -u "0:$SESSION_TOKEN" -o page.json \
+      "https://tripletex.no/v2/ledger/posting?dateFrom=2022-01-01&dateTo=2023-01-01&count=10000&fields=..."
+
+and otherwise a synthetic page of 10000 postings.
+
+Usage: python benchmarks/bench_decode.py [--page page.json] [--repeat 5]
+"""
+import argparse
+import timeit
+
+from tripletex.testing import posting_page_bytes, synthetic_postings
+from tripletex.tripletex import POSTING_DECODERS, PostingDimensions
+
+
+def decode(decoder, content: bytes):
+    dimensions = PostingDimensions()
+    _, values = decoder.decode_page(content)
+    return [decoder.to_posting(row, dimensions) for row in values]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page", help="recorded response from /ledger/posting")
+    parser.add_argument("--count", type=int, default=10000, help="size of synthetic page")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.page:
+        with open(args.page, "rb") as f:
+            content = f.read()
+    else:
+        content = posting_page_bytes(synthetic_postings(args.count))
+
+    print(f"Page of {len(content) / 1e6:.1f} MB")
+
+    baseline = None
+    for name, factory in POSTING_DECODERS.items():
+        try:
+            decoder = factory()
+        except ImportError as e:
+            print(f"{name:>8}: skipped ({e})")
+            continue
+
+        result = decode(decoder, content)
+        if baseline is None:
+            baseline = result
+        elif result != baseline:
+            raise AssertionError(f"{name} decoded a different result")
+
+        best = min(timeit.repeat(lambda: decode(decoder, content), number=1, repeat=args.repeat))
+        print(f"{name:>8}: {best * 1000:8.1f} ms  ({len(result)} postings)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import pytest
+
+from fake_server_fixtures import pytest_addoption, pytest_generate_tests, server  # noqa: F401
+from tripletex.tripletex import Tripletex, TripletexConnectorV2
+
+
+@pytest.fixture
+def tripletex(server):
+    with TripletexConnectorV2("customer", "employee", base_url=server.base_url) as connector:
+        yield Tripletex(1, connector=connector, decoder="msgspec")
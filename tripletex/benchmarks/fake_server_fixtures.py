@@ -0,0 +1,39 @@
+"""
+Pytest options and fixtures for benchmarks against FakeTripletexServer.
+
+Shared by tripletex/benchmarks and tripletexweb/backend/benchmarks, whose
+conftest.py import the hooks and fixtures from here. Kept out of the
+tripletex package, which does not depend on pytest.
+
+    --posting-counts  comma separated sizes of the synthetic ledger
+    --latency         seconds of latency added to each response
+"""
+import pytest
+
+from tripletex.testing import FakeTripletexServer
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--posting-counts",
+        default="10000,100000,1000000",
+        help="comma separated sizes of the synthetic ledger",
+    )
+    parser.addoption(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="seconds of latency added by the fake server to each response",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "posting_count" in metafunc.fixturenames:
+        counts = [int(count) for count in metafunc.config.getoption("posting_counts").split(",")]
+        metafunc.parametrize("posting_count", counts, scope="session")
+
+
+@pytest.fixture(scope="session")
+def server(posting_count, request):
+    with FakeTripletexServer.synthetic(posting_count, latency=request.config.getoption("latency")) as server:
+        yield server
@@ -0,0 +1,59 @@
+"""
+Benchmarks against FakeTripletexServer, run with:
+
+    pytest benchmarks [--posting-counts 10000,100000] [--latency 0.05]
+"""
+import pytest
+
+from tripletex.tripletex import Posting, Tripletex, TripletexConnectorV2
+
+DATE_START = "2014-01-01"
+DATE_TO = "2024-01-01"
+
+
+def group_by_month(row: Posting):
+    return ('%d-%d' % (row.date.year, row.date.month), {'year': row.date.year, 'month': row.date.month})
+
+
+def group_by_project(row: Posting):
+    return (str(row.project_id) if row.project_id is not None else "", row.project_name)
+
+
+def group_by_account(row: Posting):
+    return (str(row.account_number), row.account_name)
+
+
+@pytest.fixture(scope="session")
+def postings(server):
+    with TripletexConnectorV2("customer", "employee", base_url=server.base_url) as connector:
+        return Tripletex(1, connector=connector).get_postings(DATE_START, DATE_TO, shard="month")
+
+
+def test_get_postings(benchmark, tripletex, posting_count):
+    # The original fetch, paging through the whole range without shards.
+    result = benchmark.pedantic(tripletex.get_postings, args=(DATE_START, DATE_TO), rounds=1)
+    assert len(result) == posting_count
+
+
+def test_get_postings_parallel(benchmark, tripletex, posting_count):
+    result = benchmark.pedantic(tripletex.get_postings, args=(DATE_START, DATE_TO), kwargs={"shard": "month", "max_workers": 6}, rounds=1)
+    assert len(result) == posting_count
+
+
+def test_aggregate_postings(benchmark, postings):
+    benchmark.pedantic(Tripletex.aggregate_postings, args=(postings, group_by_month, group_by_project, group_by_account), rounds=3)
+
+
+def test_aggregate_columns(benchmark, postings):
+    pytest.importorskip("numpy")
+    from tripletex.columnar import PostingColumns, aggregate_columns
+
+    def aggregate():
+        return aggregate_columns(
+            PostingColumns.from_postings(postings),
+            (("year", "month"), group_by_month),
+            (("project_id",), group_by_project),
+            (("account_number",), group_by_account),
+        )
+
+    benchmark.pedantic(aggregate, rounds=3)
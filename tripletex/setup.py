@@ -9,14 +9,36 @@ setuptools.setup(
         # trouble updating this if it goes in one line.
         # fmt: off
         "requests>=2.26.0",
+        "urllib3>=1.26.0",
         # fmt: on
     ],
     extras_require={
+        "async": [
+            # fmt: off
+            "httpx>=0.24.0",
+            # fmt: on
+        ],
+        "columnar": [
+            # fmt: off
+            "numpy>=1.22.0",
+            # fmt: on
+        ],
+        "fast": [
+            # fmt: off
+            "msgspec>=0.18.0",
+            "orjson>=3.8.0",
+            # fmt: on
+        ],
         "dev": [
             # Do not allow black to put these on one line. It seems Renovate has
             # trouble updating this if it goes in one line.
             # fmt: off
+            "httpx>=0.24.0",
+            "msgspec>=0.18.0",
+            "numpy>=1.22.0",
+            "orjson>=3.8.0",
             "pytest>=6.2.5",
+            "pytest-benchmark>=4.0.0",
             "python-dotenv==0.20.0",
             "wheel",
             # fmt: on
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from tripletex.ledger_store import LedgerStore
+from tripletex.testing import FakeTripletexServer
+from tripletex.tripletex import Tripletex, TripletexConnectorV2
+
+pytest.importorskip("httpx")
+
+from tripletex.async_tripletex import AsyncTripletex, AsyncTripletexConnector  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeTripletexServer.synthetic(3000, date_start="2022-01-01", date_to="2023-01-01") as server:
+        yield server
+
+
+@pytest.fixture(scope="module")
+def tripletex(server):
+    with TripletexConnectorV2("customer", "employee", base_url=server.base_url) as connector:
+        yield Tripletex(1, connector=connector)
+
+
+def run(server, method: str, *args, **kwargs):
+    async def call():
+        async with AsyncTripletexConnector("customer", "employee", base_url=server.base_url) as connector:
+            return await getattr(AsyncTripletex(1, connector=connector), method)(*args, **kwargs)
+
+    return asyncio.run(call())
+
+
+class TestAsyncTripletex:
+    @pytest.mark.parametrize("shard", [None, "month"])
+    def test_get_postings(self, server, tripletex, shard):
+        expected = tripletex.get_postings("2022-01-01", "2023-01-01", account_start=3000, shard=shard)
+        assert run(server, "get_postings", "2022-01-01", "2023-01-01", account_start=3000, shard=shard) == expected
+
+    @pytest.mark.parametrize("method", ["get_departments", "get_accounts", "get_projects"])
+    def test_reference_data(self, server, tripletex, method):
+        assert run(server, method) == getattr(tripletex, method)()
+
+    def test_gather(self, server):
+        async def call():
+            async with AsyncTripletexConnector("customer", "employee", base_url=server.base_url, pool_size=4) as connector:
+                tripletex = AsyncTripletex(1, connector=connector)
+                return await asyncio.gather(
+                    tripletex.get_postings("2022-01-01", "2023-01-01", shard="month"),
+                    tripletex.get_departments(),
+                    tripletex.get_accounts(),
+                    tripletex.get_projects(),
+                )
+
+        postings, departments, accounts, projects = asyncio.run(call())
+        assert len(postings) == 3000
+        assert departments and accounts and projects
+
+    def test_store_sync(self, server, tripletex, tmp_path):
+        sync_store = LedgerStore(str(tmp_path / "sync.sqlite"), account_start=3000)
+        async_store = LedgerStore(str(tmp_path / "async.sqlite"), account_start=3000)
+
+        expected = tripletex.get_postings("2022-01-01", "2023-01-01", store=sync_store)
+        assert run(server, "get_postings", "2022-01-01", "2023-01-01", store=async_store) == expected
+        assert sync_store._stored_digests() == async_store._stored_digests()
@@ -0,0 +1,80 @@
+import datetime
+import random
+
+import pytest
+
+from tripletex.tripletex import Posting, Tripletex
+
+np = pytest.importorskip("numpy")
+
+from tripletex.columnar import PostingColumns, aggregate_columns  # noqa: E402
+
+
+def make_postings(n: int) -> list[Posting]:
+    rng = random.Random(1)
+    postings = []
+    for i in range(n):
+        department = rng.choice([None, (1, "Kafé"), (2, "Bar")])
+        project = rng.choice([None, (10, "Prosjekt", 20001), (11, "Annet", None)])
+        account = rng.choice([(3000, "Salg"), (4000, "Varekjøp"), (8050, "Renter"), (6800, "Kontor")])
+        postings.append(Posting(
+            date=datetime.date(2022, 1, 1) + datetime.timedelta(days=rng.randrange(400)),
+            description=None,
+            amount=rng.randrange(-100000, 100000) / 100,
+            voucher_number=i,
+            voucher_year=2022,
+            voucher_description=None,
+            department_name=department[1] if department else None,
+            department_number=department[0] if department else None,
+            account_name=account[1],
+            account_number=account[0],
+            project_id=project[0] if project else None,
+            project_name=project[1] if project else None,
+            project_number=project[2] if project else None,
+            id=i,
+        ))
+    return postings
+
+
+def group_by_month(row: Posting):
+    return ('%d-%d' % (row.date.year, row.date.month), {'year': row.date.year, 'month': row.date.month})
+
+
+def group_by_department(row: Posting):
+    return (str(row.department_number) if row.department_number is not None else "", row.department_name)
+
+
+def group_by_account(row: Posting):
+    return (str(row.account_number), row.account_name)
+
+
+class TestColumnar:
+    def test_same_as_aggregate_postings(self):
+        postings = make_postings(2000)
+
+        expected = Tripletex.aggregate_postings(postings, group_by_month, group_by_department, group_by_account)
+        result = aggregate_columns(
+            PostingColumns.from_postings(postings),
+            (("year", "month"), group_by_month),
+            (("department_number",), group_by_department),
+            (("account_number",), group_by_account),
+        )
+
+        assert result == expected
+        assert list(result) == list(expected)
+
+    def test_posting_roundtrip(self):
+        postings = make_postings(50)
+        columns = PostingColumns.from_postings(postings)
+        assert [columns.posting(i) for i in range(len(columns))] == postings
+
+    def test_mask(self):
+        postings = make_postings(200)
+        columns = PostingColumns.from_postings(postings)
+
+        def only_sales(row: Posting):
+            return row.account_number == 3000
+
+        expected = Tripletex.aggregate_postings(postings, only_sales, group_by_account)
+        result = aggregate_columns(columns, (("account_number",), group_by_account), mask=columns["account_number"] == 3000)
+        assert result == expected
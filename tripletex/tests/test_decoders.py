@@ -0,0 +1,32 @@
+import pytest
+
+from tripletex.testing import posting_page_bytes, synthetic_postings
+from tripletex.tripletex import POSTING_DECODERS, PostingDimensions, get_posting_decoder
+
+
+def decode(decoder, content: bytes):
+    dimensions = PostingDimensions()
+    count, values = decoder.decode_page(content)
+    return count, [decoder.to_posting(row, dimensions) for row in values], [decoder.id_version(row) for row in values]
+
+
+class TestDecoders:
+    @pytest.mark.parametrize("name", [name for name in POSTING_DECODERS if name != "json"])
+    def test_same_as_json(self, name):
+        pytest.importorskip(name)
+        content = posting_page_bytes(synthetic_postings(500))
+
+        assert decode(get_posting_decoder(name), content) == decode(get_posting_decoder("json"), content)
+
+    def test_unknown_decoder(self):
+        with pytest.raises(ValueError):
+            get_posting_decoder("yaml")
+
+    def test_dimensions_per_call(self):
+        decoder = get_posting_decoder("json")
+        _, first, _ = decode(decoder, posting_page_bytes(synthetic_postings(10)))
+        _, second, _ = decode(decoder, posting_page_bytes(synthetic_postings(10)))
+
+        assert len({id(posting._dimensions) for posting in first}) == 1
+        assert first[0]._dimensions is not second[0]._dimensions
+        assert decoder.to_posting(decoder.decode_page(posting_page_bytes(synthetic_postings(1)))[1][0])._dimensions is not first[0]._dimensions
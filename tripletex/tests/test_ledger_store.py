@@ -0,0 +1,70 @@
+import datetime
+
+from tripletex.ledger_store import LedgerStore
+from tripletex.tripletex import Tripletex
+
+
+def make_posting(id: int, date: str, amount: float, version: int = 0):
+    return {
+        "id": id,
+        "version": version,
+        "date": date,
+        "amount": amount,
+        "description": None,
+        "account": {"number": 3000, "name": "Salgsinntekt"},
+        "department": None,
+        "voucher": {"number": id, "description": "", "year": int(date[0:4])},
+        "project": None,
+    }
+
+
+class FakeTripletex(Tripletex):
+    """Serves postings from memory and records the requested windows."""
+
+    def __init__(self, postings):
+        super().__init__(0, connector=None)
+        self.postings = postings
+        self.requests = []
+
+    def _get_all_postings(self, date_start, date_to, account_start, account_end, fields=None):
+        self.requests.append((date_start, date_to, fields))
+        return [
+            posting for posting in self.postings
+            if date_start <= posting["date"] < date_to
+            and account_start <= posting["account"]["number"] <= account_end
+        ]
+
+
+class TestLedgerStore:
+    def test_sync_fetches_only_changed_months(self, tmp_path):
+        tripletex = FakeTripletex([
+            make_posting(1, "2022-01-10", 100),
+            make_posting(2, "2023-01-10", 200),
+            make_posting(3, "2023-02-10", 300),
+        ])
+        store = LedgerStore(str(tmp_path / "ledger.sqlite"), closed_before="2023-01-01")
+
+        result = store.sync(tripletex, "2022-01-01", "2023-03-01")
+        assert len(result.fetched) == 14
+
+        # Pretend the last sync was in March 2023 so no month is past the watermark.
+        store._set_meta("watermark", "2023-03-01")
+        tripletex.postings[2] = make_posting(3, "2023-02-10", 350, version=1)
+        tripletex.requests.clear()
+
+        result = store.sync(tripletex, "2022-01-01", "2023-03-01")
+        assert result.fetched == [202302]
+        assert result.unchanged == [202301]
+        assert len(result.closed) == 12
+        assert all(request[0] >= "2023-01-01" for request in tripletex.requests)
+
+        postings = store.get_postings("2022-01-01", "2023-03-01")
+        assert [(p.id, p.amount) for p in postings] == [(1, 100), (2, 200), (3, 350)]
+        assert postings[0].date == datetime.date(2022, 1, 10)
+
+    def test_get_postings_with_store(self, tmp_path):
+        tripletex = FakeTripletex([make_posting(1, "2023-01-10", 100)])
+        store = LedgerStore(str(tmp_path / "ledger.sqlite"))
+
+        postings = tripletex.get_postings("2023-01-01", "2023-02-01", store=store)
+        assert [p.id for p in postings] == [1]
@@ -0,0 +1,68 @@
+from tripletex.metrics import Metrics, endpoint_of, format_prometheus
+from tripletex.testing import FakeTripletexServer
+from tripletex.tripletex import Tripletex, TripletexConnectorV2
+
+
+class TestMetrics:
+    def test_span_and_count(self):
+        metrics = Metrics()
+        for _ in range(2):
+            with metrics.span("write", report="aggregated") as labels:
+                labels["status"] = "ok"
+        metrics.count("rows", 10, report="aggregated")
+        metrics.count("rows", 5, report="aggregated")
+
+        data = metrics.to_dict()
+        assert [(span["name"], span["labels"], span["count"]) for span in data["spans"]] == [
+            ("write", {"report": "aggregated", "status": "ok"}, 2),
+        ]
+        assert data["counters"] == [{"name": "rows", "labels": {"report": "aggregated"}, "value": 15}]
+        assert Metrics.from_dict(data).to_dict() == data
+
+    def test_merge(self):
+        first = Metrics()
+        first.observe("fetch", 1.0)
+        first.count("rows", 3)
+        second = Metrics()
+        second.observe("fetch", 2.5)
+        second.count("rows", 4)
+
+        first.merge(second)
+        assert first.to_dict() == {
+            "spans": [{"name": "fetch", "labels": {}, "count": 2, "sum": 3.5, "max": 2.5}],
+            "counters": [{"name": "rows", "labels": {}, "value": 7}],
+        }
+
+    def test_format_prometheus(self):
+        metrics = Metrics()
+        metrics.observe("fetch", 1.5, endpoint="/ledger/posting")
+        metrics.count("rows", 3)
+
+        assert format_prometheus([({"refresh": "accounting"}, metrics)], prefix="okoreports_") == "\n".join([
+            "# TYPE okoreports_fetch_seconds summary",
+            'okoreports_fetch_seconds_count{endpoint="/ledger/posting",refresh="accounting"} 1.0',
+            'okoreports_fetch_seconds_sum{endpoint="/ledger/posting",refresh="accounting"} 1.5',
+            "# TYPE okoreports_fetch_seconds_max gauge",
+            'okoreports_fetch_seconds_max{endpoint="/ledger/posting",refresh="accounting"} 1.5',
+            "# TYPE okoreports_rows_total counter",
+            'okoreports_rows_total{refresh="accounting"} 3.0',
+        ]) + "\n"
+
+    def test_endpoint_of(self):
+        assert endpoint_of("/ledger/posting?dateFrom=2023-01-01&from=0") == "/ledger/posting"
+        assert endpoint_of("/project/123") == "/project/:id"
+
+    def test_connector(self):
+        metrics = Metrics()
+        with FakeTripletexServer.synthetic(500, date_start="2022-01-01", date_to="2023-01-01") as server:
+            with TripletexConnectorV2("customer", "employee", base_url=server.base_url, metrics=metrics) as connector:
+                postings = Tripletex(1, connector=connector).get_postings("2022-01-01", "2023-01-01", shard="month")
+
+        spans = {(span["name"], tuple(sorted(span["labels"].items()))): span for span in metrics.to_dict()["spans"]}
+        requests = spans[("tripletex_http_request", (("endpoint", "/ledger/posting"), ("method", "GET"), ("status", "200")))]
+        assert requests["count"] == 12
+        assert spans[("tripletex_posting_page", (("page", "0"),))]["count"] == 12
+
+        counters = {counter["name"]: counter["value"] for counter in metrics.to_dict()["counters"]}
+        assert counters["tripletex_posting_rows"] == len(postings) == 500
+        assert counters["tripletex_http_response_bytes"] > 0
@@ -0,0 +1,96 @@
+import datetime
+import threading
+
+from tripletex.session_token import SessionTokenProvider
+
+
+class Clock:
+    def __init__(self, now: datetime.datetime):
+        self.now = now
+
+    def __call__(self) -> datetime.datetime:
+        return self.now
+
+
+class TokenFactory:
+    def __init__(self):
+        self.created: list[datetime.date] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, expiration_date: datetime.date) -> str:
+        with self._lock:
+            self.created.append(expiration_date)
+            return f"token-{len(self.created)}"
+
+
+def make_provider(clock: Clock, path=None) -> SessionTokenProvider:
+    provider = SessionTokenProvider("key", path=path)
+    provider._now = clock
+    return provider
+
+
+def wait_for_refresh(provider: SessionTokenProvider):
+    if provider._refresh_thread is not None:
+        provider._refresh_thread.join()
+
+
+class TestSessionTokenProvider:
+    def test_reuses_token(self):
+        clock = Clock(datetime.datetime(2023, 3, 10, 12))
+        create = TokenFactory()
+        provider = make_provider(clock)
+
+        assert provider.get(create) == "token-1"
+        clock.now += datetime.timedelta(hours=6)
+        assert provider.get(create) == "token-1"
+        assert create.created == [datetime.date(2023, 3, 12)]
+
+    def test_refreshes_in_background(self):
+        clock = Clock(datetime.datetime(2023, 3, 10, 12))
+        create = TokenFactory()
+        provider = make_provider(clock)
+        provider.get(create)
+
+        # Less than a day left, the old token is still handed out.
+        clock.now = datetime.datetime(2023, 3, 11, 6)
+        assert provider.get(create) == "token-1"
+        wait_for_refresh(provider)
+        assert provider.get(create) == "token-2"
+        assert create.created == [datetime.date(2023, 3, 12), datetime.date(2023, 3, 13)]
+
+    def test_blocks_when_almost_expired(self):
+        clock = Clock(datetime.datetime(2023, 3, 10, 12))
+        create = TokenFactory()
+        provider = make_provider(clock)
+        provider.get(create)
+
+        clock.now = datetime.datetime(2023, 3, 11, 23, 30)
+        assert provider.get(create) == "token-2"
+
+    def test_shared_through_file(self, tmp_path):
+        clock = Clock(datetime.datetime(2023, 3, 10, 12))
+        create = TokenFactory()
+        path = str(tmp_path / "tokens.json")
+
+        # Separate providers stand in for separate processes.
+        providers = [make_provider(clock, path) for _ in range(8)]
+        results = []
+        threads = [threading.Thread(target=lambda p=p: results.append(p.get(create))) for p in providers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["token-1"] * 8
+        assert len(create.created) == 1
+
+    def test_ignores_token_of_other_credentials(self, tmp_path):
+        clock = Clock(datetime.datetime(2023, 3, 10, 12))
+        create = TokenFactory()
+        path = str(tmp_path / "tokens.json")
+
+        make_provider(clock, path).get(create)
+        other = SessionTokenProvider("other", path=path)
+        other._now = clock
+        assert other.get(create) == "token-2"
+        assert make_provider(clock, path).get(create) == "token-1"
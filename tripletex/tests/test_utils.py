@@ -0,0 +1,26 @@
+import pytest
+
+from tripletex._utils import split_date_range
+
+
+class TestSplitDateRange:
+    def test_month(self):
+        assert split_date_range("2022-11-15", "2023-02-01", "month") == [
+            ("2022-11-15", "2022-12-01"),
+            ("2022-12-01", "2023-01-01"),
+            ("2023-01-01", "2023-02-01"),
+        ]
+
+    def test_week(self):
+        assert split_date_range("2023-01-01", "2023-01-20", "week") == [
+            ("2023-01-01", "2023-01-08"),
+            ("2023-01-08", "2023-01-15"),
+            ("2023-01-15", "2023-01-20"),
+        ]
+
+    def test_empty(self):
+        assert split_date_range("2023-01-01", "2023-01-01", "month") == []
+
+    def test_unknown_shard(self):
+        with pytest.raises(ValueError):
+            split_date_range("2023-01-01", "2023-02-01", "day")
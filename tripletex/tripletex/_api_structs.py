@@ -0,0 +1,48 @@
+from typing import List, Optional
+
+import msgspec
+
+# msgspec mirrors of the posting types in _api_types, used to decode
+# /ledger/posting pages without building intermediate dicts.
+# All fields except id are optional, so the same structs can decode
+# responses requested with only a subset of the fields.
+
+
+class PostingAccount(msgspec.Struct):
+    number: int
+    name: str
+
+
+class PostingDepartment(msgspec.Struct):
+    id: int
+    name: Optional[str] = None
+    departmentNumber: Optional[str] = None
+
+
+class PostingVoucher(msgspec.Struct):
+    number: int
+    year: int
+    description: Optional[str] = None
+
+
+class PostingProject(msgspec.Struct):
+    id: int
+    name: Optional[str] = None
+    number: Optional[str] = None
+
+
+class Posting(msgspec.Struct):
+    id: int
+    version: int = 0
+    date: Optional[str] = None
+    amount: float = 0.0
+    description: Optional[str] = None
+    account: Optional[PostingAccount] = None
+    department: Optional[PostingDepartment] = None
+    voucher: Optional[PostingVoucher] = None
+    project: Optional[PostingProject] = None
+
+
+class ListResponsePosting(msgspec.Struct):
+    count: int
+    values: List[Posting]
@@ -77,6 +77,7 @@ class PostingProject(TypedDict):
 
 class Posting(TypedDict):
     id: int
+    version: int
     account: PostingAccount
     amount: float
     date: str
@@ -1,3 +1,10 @@
+import asyncio
+import datetime
+import threading
+import time
+from typing import Optional
+
+
 def get_num(val):
     if val is None:
         return 0
@@ -14,3 +21,73 @@ def get_float(val):
         return float(val)
     except ValueError:
         return 0
+
+
+def none_for_empty(value: Optional[str]):
+    if value == "":
+        return None
+    return value
+
+
+def str_to_int(value: Optional[str]):
+    if value is not None:
+        return int(value)
+
+
+def split_date_range(date_start: str, date_to: str, shard: str) -> list[tuple[str, str]]:
+    """Split [date_start, date_to) into consecutive windows.
+
+    shard is either "month" (windows aligned to the first of each month)
+    or "week" (windows of seven days starting at date_start).
+    """
+    start = datetime.date.fromisoformat(date_start)
+    end = datetime.date.fromisoformat(date_to)
+
+    windows = []
+    while start < end:
+        if shard == "month":
+            if start.month == 12:
+                next_start = datetime.date(start.year + 1, 1, 1)
+            else:
+                next_start = datetime.date(start.year, start.month + 1, 1)
+        elif shard == "week":
+            next_start = start + datetime.timedelta(days=7)
+        else:
+            raise ValueError(f"Unknown shard size: {shard}")
+
+        next_start = min(next_start, end)
+        windows.append((start.isoformat(), next_start.isoformat()))
+        start = next_start
+
+    return windows
+
+
+class RateLimiter:
+    """Space out calls so that at most `rate` calls start per second.
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def _reserve(self) -> float:
+        """Take the next slot and return how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+
+        return slot - now
+
+    def wait(self):
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
@@ -0,0 +1,235 @@
+"""
+asyncio version of Tripletex, built on httpx.
+
+Independent calls can be run concurrently over one connection pool:
+
+    async with AsyncTripletexConnector(customer_token, employee_token) as connector:
+        tripletex = AsyncTripletex(context_id, connector)
+        postings, departments = await asyncio.gather(
+            tripletex.get_postings("2023-01-01", "2024-01-01", shard="month"),
+            tripletex.get_departments(),
+        )
+
+Requires httpx, which is installed with: pip install "cyb-tripletex[async]"
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import logging
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+import httpx
+
+from tripletex._utils import RateLimiter, split_date_range
+from tripletex.session_token import get_session_token_provider
+from tripletex.tripletex import (BASE_URL, POSTING_FIELDS, POSTING_MAX_PAGES,
+                                 POSTING_PAGE_SIZE, Account, Department,
+                                 Posting, PostingDecoder, PostingDimensions,
+                                 Project, Tripletex, TripletexException,
+                                 decode_posting_page, get_posting_decoder,
+                                 posting_page_path)
+from tripletex.metrics import Metrics, endpoint_of, maybe_span
+
+if TYPE_CHECKING:
+    from tripletex.ledger_store import LedgerStore
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def raise_for_status_pretty(response: httpx.Response):
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Response: {response.content}")
+        raise TripletexException(f"HTTP Error: {str(e)}") from e
+
+
+class AsyncTripletexConnector:
+    """
+    asyncio counterpart of TripletexConnectorV2, taking the same arguments.
+
+    Calls share one httpx.AsyncClient with at most pool_size connections.
+    GET requests are retried on connection errors and 429/5xx responses.
+    Session tokens come from the same provider as TripletexConnectorV2,
+    and requests are timed into metrics in the same way.
+    """
+
+    def __init__(
+        self,
+        customer_token: str,
+        employee_token: str,
+        pool_size: int = 10,
+        max_retries: int = 3,
+        timeout: Optional[float] = 120,
+        max_requests_per_second: Optional[float] = None,
+        base_url: str = BASE_URL,
+        token_cache_path: Optional[str] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.customer_token = customer_token
+        self.employee_token = employee_token
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.base_url = base_url
+        self.metrics = metrics
+        self.rate_limiter = RateLimiter(max_requests_per_second) if max_requests_per_second else None
+        self.token_provider = get_session_token_provider(base_url, customer_token, employee_token, path=token_cache_path)
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=httpx.AsyncHTTPTransport(retries=max_retries),
+            headers={"Accept": "application/json"},
+        )
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def __aenter__(self) -> AsyncTripletexConnector:
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _authorization_header_value(self) -> str:
+        session_token = self.token_provider.cached()
+        if session_token is None:
+            # Token creation may block on other workers, keep it off the loop.
+            session_token = await asyncio.to_thread(self.token_provider.get, self._create_session_token)
+
+        basic_value = base64.b64encode(f"0:{session_token}".encode("utf-8")).decode("utf-8")
+        return "Basic {}".format(basic_value)
+
+    def _create_session_token(self, expiration_date) -> str:
+        logger.info("Creating session token")
+
+        with maybe_span(self.metrics, "tripletex_session_token_create"):
+            response = httpx.put(
+                f"{self.base_url}/token/session/:create",
+                params={"consumerToken": self.customer_token, "employeeToken": self.employee_token, "expirationDate": str(expiration_date)},
+                timeout=self.timeout,
+            )
+        raise_for_status_pretty(response)
+
+        return response.json()["value"]["token"]
+
+    async def call_api(self, method: str, path: str, **kwargs) -> httpx.Response:
+        headers = dict(kwargs.pop("headers", {}))
+        headers["authorization"] = await self._authorization_header_value()
+
+        endpoint = endpoint_of(path)
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                with maybe_span(self.metrics, "tripletex_rate_limit_wait"):
+                    await self.rate_limiter.wait_async()
+
+            with maybe_span(self.metrics, "tripletex_http_request", method=method, endpoint=endpoint, status="error") as labels:
+                response = await self.client.request(method, path, headers=headers, **kwargs)
+                labels["status"] = response.status_code
+            if self.metrics is not None:
+                self.metrics.count("tripletex_http_response_bytes", len(response.content), method=method, endpoint=endpoint)
+
+            if method != "GET" or response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                return response
+
+            # Same backoff as the urllib3 Retry of TripletexConnectorV2.
+            retry_after = response.headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 0.5 * (2 ** attempt)
+            attempt += 1
+            logger.info(f"Retrying {path} after {response.status_code} in {delay} seconds")
+            await asyncio.sleep(delay)
+
+
+class AsyncTripletex:
+    """
+    asyncio counterpart of Tripletex, with the same methods and results.
+    """
+
+    def __init__(self, context_id: int, connector: AsyncTripletexConnector, decoder: Union[str, PostingDecoder] = "json"):
+        self.context_id = context_id
+        self.connector = connector
+        self.decoder = get_posting_decoder(decoder)
+        self.metrics = getattr(connector, "metrics", None)
+
+    aggregate_postings = staticmethod(Tripletex.aggregate_postings)
+    get_project_id = staticmethod(Tripletex.get_project_id)
+
+    def _convert_posting(self, row: Any, dimensions: Optional[PostingDimensions] = None) -> Posting:
+        return self.decoder.to_posting(row, dimensions)
+
+    async def _get_all_postings(self, date_start: str, date_to: str, account_start: int, account_end: int, fields: str = POSTING_FIELDS) -> list[Any]:
+        result = []
+        from_ = 0
+        for page in range(POSTING_MAX_PAGES):
+            with maybe_span(self.metrics, "tripletex_posting_page", page=page):
+                response = await self.connector.call_api("GET", posting_page_path(date_start, date_to, account_start, account_end, from_, POSTING_PAGE_SIZE, fields))
+                raise_for_status_pretty(response)
+
+                this_count, values = decode_posting_page(self.decoder, response.content, self.metrics)
+            from_ += this_count
+            result.extend(values)
+
+            if this_count < POSTING_PAGE_SIZE:
+                return result
+
+            logger.info("Fetching next page of ledger items")
+
+        raise TripletexException("Too many iterations to fetch data from Tripletex")
+
+    async def _gather_windows(self, windows: list[tuple[str, str]], account_start: int, account_end: int, max_workers: int, fields: str = POSTING_FIELDS) -> list[list[Any]]:
+        """Fetch the windows with at most max_workers in flight, in window order."""
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def fetch(window: tuple[str, str]) -> list[Any]:
+            async with semaphore:
+                return await self._get_all_postings(date_start=window[0], date_to=window[1], account_start=account_start, account_end=account_end, fields=fields)
+
+        return await asyncio.gather(*(fetch(window) for window in windows))
+
+    async def get_postings(
+        self,
+        date_start: str,
+        date_to: str,
+        account_start: Optional[int] = None,
+        account_end: Optional[int] = None,
+        shard: Optional[str] = None,
+        max_workers: int = 4,
+        store: Optional[LedgerStore] = None,
+    ) -> list[Posting]:
+        """Fetch postings in [date_start, date_to), see Tripletex.get_postings.
+
+        With shard, at most max_workers windows are fetched concurrently.
+        """
+        if store is not None:
+            await store.sync_async(self, date_start=date_start, date_to=date_to, max_workers=max_workers)
+            return store.get_postings(date_start=date_start, date_to=date_to, account_start=account_start, account_end=account_end)
+
+        if shard is None:
+            windows = [(date_start, date_to)]
+        else:
+            windows = split_date_range(date_start, date_to, shard)
+            logger.info(f"Fetching ledger in {len(windows)} windows, {max_workers} at a time")
+
+        pages = await self._gather_windows(windows, account_start or 0, account_end or 9999, max_workers)
+
+        dimensions = PostingDimensions()
+        return [self._convert_posting(row, dimensions) for page in pages for row in page]
+
+    async def get_departments(self) -> list[Department]:
+        response = await self.connector.call_api("GET", "/department?count=10000")
+        raise_for_status_pretty(response)
+        return Tripletex._parse_departments(response.json())
+
+    async def get_accounts(self) -> list[Account]:
+        response = await self.connector.call_api("GET", "/ledger/account?count=10000")
+        raise_for_status_pretty(response)
+        return Tripletex._parse_accounts(response.json())
+
+    async def get_projects(self) -> list[Project]:
+        response = await self.connector.call_api("GET", "/project?count=10000")
+        raise_for_status_pretty(response)
+        return Tripletex._parse_projects(response.json())
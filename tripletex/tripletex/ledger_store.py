@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import datetime
+import hashlib
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional, Union
+
+from tripletex._utils import split_date_range
+from tripletex.tripletex import POSTING_FIELDS, Posting, PostingDimensions
+
+if TYPE_CHECKING:
+    from tripletex.async_tripletex import AsyncTripletex
+    from tripletex.tripletex import Tripletex
+
+logger = logging.getLogger(__name__)
+
+# Fields used when probing the ledger for changes.
+PROBE_FIELDS = "id,version,date"
+
+# The version is included so the digest can be computed while fetching.
+FETCH_FIELDS = POSTING_FIELDS + ",version"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posting (
+    period INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT,
+    amount REAL NOT NULL,
+    voucher_number INTEGER NOT NULL,
+    voucher_year INTEGER NOT NULL,
+    voucher_description TEXT,
+    department_name TEXT,
+    department_number INTEGER,
+    account_name TEXT NOT NULL,
+    account_number INTEGER NOT NULL,
+    project_id INTEGER,
+    project_name TEXT,
+    project_number INTEGER
+);
+CREATE INDEX IF NOT EXISTS posting_period ON posting (period);
+
+CREATE TABLE IF NOT EXISTS month (
+    period INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL,
+    synced_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+POSTING_COLUMNS = (
+    "id",
+    "date",
+    "description",
+    "amount",
+    "voucher_number",
+    "voucher_year",
+    "voucher_description",
+    "department_name",
+    "department_number",
+    "account_name",
+    "account_number",
+    "project_id",
+    "project_name",
+    "project_number",
+)
+
+
+def period_of(date: str) -> int:
+    """Return the month partition key for an ISO date, e.g. 202301."""
+    return int(date[0:4]) * 100 + int(date[5:7])
+
+
+def compute_digest(id_versions: Iterable[tuple[int, int]]) -> str:
+    """Digest of the id and version of all postings in a month."""
+    h = hashlib.sha1()
+    for id, version in sorted(id_versions):
+        h.update(f"{id}:{version}\n".encode("ascii"))
+    return h.hexdigest()
+
+
+@dataclass
+class SyncResult:
+    fetched: list[int] = field(default_factory=list)
+    unchanged: list[int] = field(default_factory=list)
+    closed: list[int] = field(default_factory=list)
+
+
+class LedgerStore:
+    """
+    Local copy of the ledger for a range of accounts, stored in SQLite
+    and partitioned by month.
+
+    A sync only fetches months that are missing, newer than the last
+    sync watermark or whose id/version digest differs from the stored
+    one. Months before closed_before are never refetched once stored.
+    """
+
+    def __init__(self, path: str, account_start: int = 0, account_end: int = 9999, closed_before: Optional[str] = None):
+        self.path = path
+        self.account_start = account_start
+        self.account_end = account_end
+        self.closed_before = closed_before
+
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self._check_account_range()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self) -> LedgerStore:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _check_account_range(self):
+        value = f"{self.account_start}-{self.account_end}"
+        stored = self._get_meta("account_range")
+        if stored is None:
+            self._set_meta("account_range", value)
+            self.db.commit()
+        elif stored != value:
+            raise ValueError(f"Ledger store {self.path} holds accounts {stored}, not {value}")
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _set_meta(self, key: str, value: str):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """First day of the month of the last sync."""
+        return self._get_meta("watermark")
+
+    def clear(self):
+        self.db.execute("DELETE FROM posting")
+        self.db.execute("DELETE FROM month")
+        self.db.execute("DELETE FROM meta WHERE key = 'watermark'")
+        self.db.commit()
+
+    def _stored_digests(self) -> dict[int, str]:
+        return dict(self.db.execute("SELECT period, digest FROM month"))
+
+    def _save_month(self, period: int, digest: str, postings: list[Posting]):
+        synced_at = datetime.datetime.now().isoformat(timespec="seconds")
+        with self.db:
+            self.db.execute("DELETE FROM posting WHERE period = ?", (period,))
+            self.db.executemany(
+                f"INSERT INTO posting (period, {', '.join(POSTING_COLUMNS)}) VALUES (?{', ?' * len(POSTING_COLUMNS)})",
+                (
+                    (period, *(getattr(posting, column) for column in POSTING_COLUMNS))
+                    for posting in postings
+                ),
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO month (period, digest, synced_at) VALUES (?, ?, ?)",
+                (period, digest, synced_at),
+            )
+
+    def _plan_sync(self, date_start: str, date_to: str) -> tuple[SyncResult, dict[int, str], list[tuple[str, str]], list[tuple[str, str]]]:
+        """Split [date_start, date_to) into months to fetch and months to probe."""
+        windows = split_date_range(date_start, date_to, "month")
+        for window in windows:
+            if window[0][8:10] != "01" or window[1][8:10] != "01":
+                raise ValueError(f"Range {date_start} to {date_to} is not aligned to months")
+
+        result = SyncResult()
+        stored = self._stored_digests()
+        watermark = self.watermark
+
+        to_fetch: list[tuple[str, str]] = []
+        to_probe: list[tuple[str, str]] = []
+        for window in windows:
+            period = period_of(window[0])
+            if period not in stored:
+                to_fetch.append(window)
+            elif self.closed_before is not None and window[1] <= self.closed_before:
+                result.closed.append(period)
+            elif watermark is None or window[0] >= watermark:
+                to_fetch.append(window)
+            else:
+                to_probe.append(window)
+
+        return result, stored, to_fetch, to_probe
+
+    def _probe_month(self, tripletex: Union[Tripletex, AsyncTripletex], result: SyncResult, stored: dict[int, str], window: tuple[str, str], items: list[Any]) -> bool:
+        """Record an unchanged month, or return True if it must be fetched."""
+        period = period_of(window[0])
+        if compute_digest(map(tripletex.decoder.id_version, items)) == stored[period]:
+            result.unchanged.append(period)
+            return False
+        return True
+
+    def _store_month(self, tripletex: Union[Tripletex, AsyncTripletex], result: SyncResult, window: tuple[str, str], items: list[Any]):
+        period = period_of(window[0])
+        dimensions = PostingDimensions()
+        self._save_month(
+            period,
+            compute_digest(map(tripletex.decoder.id_version, items)),
+            [tripletex._convert_posting(item, dimensions) for item in items],
+        )
+        result.fetched.append(period)
+
+    def _finish_sync(self):
+        today = datetime.date.today()
+        self._set_meta("watermark", datetime.date(today.year, today.month, 1).isoformat())
+        self.db.commit()
+
+    def sync(self, tripletex: Tripletex, date_start: str, date_to: str, max_workers: int = 4) -> SyncResult:
+        """Bring the months in [date_start, date_to) up to date.
+
+        Both dates must be the first day of a month.
+        """
+        result, stored, to_fetch, to_probe = self._plan_sync(date_start, date_to)
+
+        if to_probe:
+            logger.info(f"Probing {len(to_probe)} months for changes")
+            for window, items in self._fetch_windows(tripletex, to_probe, max_workers, fields=PROBE_FIELDS):
+                if self._probe_month(tripletex, result, stored, window, items):
+                    to_fetch.append(window)
+
+        to_fetch.sort()
+        if to_fetch:
+            logger.info(f"Fetching {len(to_fetch)} months of ledger")
+            for window, items in self._fetch_windows(tripletex, to_fetch, max_workers, fields=FETCH_FIELDS):
+                self._store_month(tripletex, result, window, items)
+
+        self._finish_sync()
+        return result
+
+    async def sync_async(self, tripletex: AsyncTripletex, date_start: str, date_to: str, max_workers: int = 4) -> SyncResult:
+        """Same as sync, fetching with an AsyncTripletex."""
+        result, stored, to_fetch, to_probe = self._plan_sync(date_start, date_to)
+
+        if to_probe:
+            logger.info(f"Probing {len(to_probe)} months for changes")
+            pages = await tripletex._gather_windows(to_probe, self.account_start, self.account_end, max_workers, fields=PROBE_FIELDS)
+            for window, items in zip(to_probe, pages):
+                if self._probe_month(tripletex, result, stored, window, items):
+                    to_fetch.append(window)
+
+        to_fetch.sort()
+        if to_fetch:
+            logger.info(f"Fetching {len(to_fetch)} months of ledger")
+            pages = await tripletex._gather_windows(to_fetch, self.account_start, self.account_end, max_workers, fields=FETCH_FIELDS)
+            for window, items in zip(to_fetch, pages):
+                self._store_month(tripletex, result, window, items)
+
+        self._finish_sync()
+        return result
+
+    def _fetch_windows(self, tripletex: Tripletex, windows: list[tuple[str, str]], max_workers: int, fields: str):
+        def fetch(window: tuple[str, str]) -> list[Any]:
+            return tripletex._get_all_postings(
+                date_start=window[0],
+                date_to=window[1],
+                account_start=self.account_start,
+                account_end=self.account_end,
+                fields=fields,
+            )
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            yield from zip(windows, executor.map(fetch, windows))
+
+    def iter_postings(self, date_start: str, date_to: str, account_start: Optional[int] = None, account_end: Optional[int] = None) -> Iterator[Posting]:
+        """Yield stored postings in [date_start, date_to), ordered by month.
+
+        Rows are streamed from the database cursor, so the full range is
+        never held in memory.
+        """
+        account_start = account_start if account_start is not None else self.account_start
+        account_end = account_end if account_end is not None else self.account_end
+        if account_start < self.account_start or account_end > self.account_end:
+            raise ValueError(f"Accounts {account_start}-{account_end} are outside of the ledger store")
+
+        cursor = self.db.execute(
+            f"SELECT {', '.join(POSTING_COLUMNS)} FROM posting"
+            " WHERE date >= ? AND date < ? AND account_number BETWEEN ? AND ?"
+            " ORDER BY period, rowid",
+            (date_start, date_to, account_start, account_end),
+        )
+
+        dimensions = PostingDimensions()
+        for row in cursor:
+            values = dict(zip(POSTING_COLUMNS, row))
+            values["date"] = datetime.date.fromisoformat(values["date"])
+            yield Posting(**values, dimensions=dimensions)
+
+    def get_postings(self, date_start: str, date_to: str, account_start: Optional[int] = None, account_end: Optional[int] = None) -> list[Posting]:
+        """Read stored postings in [date_start, date_to), ordered by month."""
+        return list(self.iter_postings(date_start=date_start, date_to=date_to, account_start=account_start, account_end=account_end))
@@ -0,0 +1,169 @@
+"""
+Timings and counters of the Tripletex calls, for finding where a refresh
+spends its time.
+
+A Metrics instance collects spans (count, total and max seconds) and
+counters, each identified by a name and labels:
+
+    metrics = Metrics()
+    connector = TripletexConnectorV2(customer_token, employee_token, metrics=metrics)
+    with metrics.span("aggregate"):
+        ...
+    metrics.count("rows", 1200, report="aggregated")
+
+The connectors record every HTTP request as "tripletex_http_request" by
+method, endpoint and status, with the size of the responses in
+"tripletex_http_response_bytes". Tripletex and AsyncTripletex record each
+page of postings as "tripletex_posting_page", and the decoding of it as
+"tripletex_posting_decode" with the number of rows in
+"tripletex_posting_rows".
+
+to_dict() gives a JSON summary, and format_prometheus() the Prometheus
+text format.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+from urllib.parse import urlsplit
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def endpoint_of(path: str) -> str:
+    """The path of a call without query and ids, e.g. "/ledger/posting"."""
+    parts = urlsplit(path).path.split("/")
+    return "/".join(":id" if part.isdigit() else part for part in parts)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (name, labels) -> [count, sum, max]
+        self._spans: dict[tuple[str, LabelKey], list[float]] = {}
+        self._counters: dict[tuple[str, LabelKey], float] = {}
+
+    def observe(self, name: str, seconds: float, **labels: Any):
+        key = (name, label_key(labels))
+        with self._lock:
+            span = self._spans.get(key)
+            if span is None:
+                self._spans[key] = [1, seconds, seconds]
+            else:
+                span[0] += 1
+                span[1] += seconds
+                span[2] = max(span[2], seconds)
+
+    @contextmanager
+    def span(self, name: str, **labels: Any) -> Iterator[dict[str, Any]]:
+        """Time the block. Labels added to the yielded dict are recorded too."""
+        labels = dict(labels)
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def count(self, name: str, value: float = 1, **labels: Any):
+        key = (name, label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def total_seconds(self, name: str, **labels: Any) -> float:
+        """Total time of the spans of name with (at least) these labels."""
+        wanted = set(label_key(labels))
+        with self._lock:
+            return sum(span[1] for (span_name, key), span in self._spans.items() if span_name == name and wanted <= set(key))
+
+    def merge(self, other: Metrics):
+        """Add the spans and counters of other."""
+        data = other.to_dict()
+        for span in data["spans"]:
+            key = (span["name"], label_key(span["labels"]))
+            with self._lock:
+                current = self._spans.get(key)
+                if current is None:
+                    self._spans[key] = [span["count"], span["sum"], span["max"]]
+                else:
+                    current[0] += span["count"]
+                    current[1] += span["sum"]
+                    current[2] = max(current[2], span["max"])
+        for counter in data["counters"]:
+            self.count(counter["name"], counter["value"], **counter["labels"])
+
+    def to_dict(self) -> dict[str, list[dict[str, Any]]]:
+        with self._lock:
+            return {
+                "spans": [
+                    {"name": name, "labels": dict(key), "count": int(span[0]), "sum": round(span[1], 6), "max": round(span[2], 6)}
+                    for (name, key), span in sorted(self._spans.items())
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(key), "value": value}
+                    for (name, key), value in sorted(self._counters.items())
+                ],
+            }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, list[dict[str, Any]]]) -> Metrics:
+        metrics = cls()
+        for span in data.get("spans", []):
+            metrics._spans[(span["name"], label_key(span["labels"]))] = [span["count"], span["sum"], span["max"]]
+        for counter in data.get("counters", []):
+            metrics._counters[(counter["name"], label_key(counter["labels"]))] = counter["value"]
+        return metrics
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join('%s="%s"' % (name, escape_label(value)) for name, value in sorted(labels.items())) + "}"
+
+
+def format_prometheus(sources: list[tuple[dict[str, str], Metrics]], prefix: str = "") -> str:
+    """Prometheus text format of several Metrics, each with extra labels.
+
+    Spans become <name>_seconds summaries (count and sum) and
+    <name>_seconds_max gauges, counters become <name>_total.
+    """
+    families: dict[tuple[str, str], list[str]] = {}
+
+    def add(name: str, type: str, labels: dict[str, str], value: float, suffix: str = ""):
+        families.setdefault((name, type), []).append("%s%s%s %s" % (name, suffix, format_labels(labels), repr(float(value))))
+
+    for extra_labels, metrics in sources:
+        data = metrics.to_dict()
+        for span in data["spans"]:
+            labels = {**span["labels"], **extra_labels}
+            name = prefix + span["name"] + "_seconds"
+            add(name, "summary", labels, span["count"], "_count")
+            add(name, "summary", labels, span["sum"], "_sum")
+            add(name + "_max", "gauge", labels, span["max"])
+        for counter in data["counters"]:
+            add(prefix + counter["name"] + "_total", "counter", {**counter["labels"], **extra_labels}, counter["value"])
+
+    lines = []
+    for (name, type), samples in families.items():
+        lines.append("# TYPE %s %s" % (name, type))
+        lines.extend(samples)
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+@contextmanager
+def maybe_span(metrics: Optional[Metrics], name: str, **labels: Any) -> Iterator[dict[str, Any]]:
+    """Metrics.span, or nothing without metrics."""
+    if metrics is None:
+        yield dict(labels)
+    else:
+        with metrics.span(name, **labels) as span_labels:
+            yield span_labels
@@ -0,0 +1,197 @@
+"""
+Session tokens shared between connectors, threads and processes.
+
+Tokens are cached in a JSON file keyed by a hash of the API url and the
+consumer/employee tokens, and the file is locked while a token is being
+created, so parallel workers (e.g. gunicorn) create one token between
+them. A token is renewed in the background when less than refresh_before
+of it is left, so calls do not wait for token creation.
+"""
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CreateToken = Callable[[datetime.date], str]
+
+
+def default_cache_path() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "cyb-tripletex", "session-tokens.json")
+
+
+def cache_key(base_url: str, customer_token: str, employee_token: str) -> str:
+    return hashlib.sha256(f"{base_url}\n{customer_token}\n{employee_token}".encode("utf-8")).hexdigest()
+
+
+def expires_at(expiration_date: datetime.date) -> datetime.datetime:
+    """A session token is valid until the start of its expiration date."""
+    return datetime.datetime.combine(expiration_date, datetime.time())
+
+
+class SessionTokenProvider:
+    """
+    Session tokens for one set of credentials, cached in memory and in
+    the file at path (None to only cache in memory).
+
+    New tokens are created with an expiration date validity days ahead.
+    Tokens with less than refresh_before left are renewed in a background
+    thread while still being used, and tokens with less than min_left left
+    are renewed before returning.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        path: Optional[str] = None,
+        validity: datetime.timedelta = datetime.timedelta(days=2),
+        refresh_before: datetime.timedelta = datetime.timedelta(days=1),
+        min_left: datetime.timedelta = datetime.timedelta(hours=1),
+    ):
+        self.key = key
+        self.path = path
+        self.validity = validity
+        self.refresh_before = refresh_before
+        self.min_left = min_left
+
+        self._token: Optional[Tuple[datetime.date, str]] = None
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def _now(self) -> datetime.datetime:
+        return datetime.datetime.now()
+
+    def _time_left(self, token: Optional[Tuple[datetime.date, str]]) -> datetime.timedelta:
+        if token is None:
+            return datetime.timedelta()
+        return expires_at(token[0]) - self._now()
+
+    def cached(self) -> Optional[str]:
+        """The token held in memory, if it does not need renewing yet."""
+        token = self._token
+        if self._time_left(token) < self.refresh_before:
+            return None
+        return token[1]
+
+    def get(self, create: CreateToken) -> str:
+        """Return a valid session token, creating one with create if needed."""
+        token = self._token
+        if self._time_left(token) < self.refresh_before:
+            with self._lock:
+                if self._time_left(self._token) < self.refresh_before:
+                    self._token = self._read() or self._token
+
+                if self._time_left(self._token) < self.min_left:
+                    self._token = self._refresh(create)
+                elif self._time_left(self._token) < self.refresh_before:
+                    self._start_background_refresh(create)
+
+                token = self._token
+
+        return token[1]
+
+    def _start_background_refresh(self, create: CreateToken):
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+
+        def refresh():
+            try:
+                token = self._refresh(create)
+            except Exception:
+                logger.exception("Background refresh of session token failed")
+                return
+            with self._lock:
+                self._token = token
+
+        self._refresh_thread = threading.Thread(target=refresh, name="tripletex-session-token", daemon=True)
+        self._refresh_thread.start()
+
+    def _refresh(self, create: CreateToken) -> Tuple[datetime.date, str]:
+        with self._file_lock():
+            # Another process may have renewed the token while we waited.
+            token = self._read()
+            if self._time_left(token) >= self.refresh_before:
+                return token
+
+            expiration_date = (self._now() + self.validity).date()
+            token = (expiration_date, create(expiration_date))
+            self._write(token)
+            return token
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if self.path is None or fcntl is None:
+            yield
+            return
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_all(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _read(self) -> Optional[Tuple[datetime.date, str]]:
+        if self.path is None:
+            return self._token
+
+        entry = self._read_all().get(self.key)
+        if entry is None:
+            return None
+        return (datetime.date.fromisoformat(entry["expirationDate"]), entry["token"])
+
+    def _write(self, token: Tuple[datetime.date, str]):
+        if self.path is None:
+            return
+
+        now = self._now()
+        entries = {
+            key: entry
+            for key, entry in self._read_all().items()
+            if expires_at(datetime.date.fromisoformat(entry["expirationDate"])) > now
+        }
+        entries[self.key] = {"expirationDate": token[0].isoformat(), "token": token[1]}
+
+        # Write to a private file and swap it in, so readers never see a
+        # partial file.
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+
+_providers: dict[Tuple[Optional[str], str], SessionTokenProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_session_token_provider(base_url: str, customer_token: str, employee_token: str, path: Optional[str] = None) -> SessionTokenProvider:
+    """Provider shared by all connectors in this process with the same credentials and cache file."""
+    key = cache_key(base_url, customer_token, employee_token)
+    with _providers_lock:
+        provider = _providers.get((path, key))
+        if provider is None:
+            provider = SessionTokenProvider(key, path=path)
+            _providers[(path, key)] = provider
+        return provider
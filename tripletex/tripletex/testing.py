@@ -0,0 +1,308 @@
+"""
+Synthetic Tripletex data and a local stand-in server for tests and
+benchmarks.
+
+The generated postings have the same shape as responses from
+/ledger/posting with the fields in POSTING_FIELDS (plus version).
+FakeTripletexServer serves them over HTTP, so TripletexConnectorV2 can be
+pointed at it with base_url.
+"""
+from __future__ import annotations
+
+import bisect
+import datetime
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from tripletex._api_types import Account as ApiAccount
+from tripletex._api_types import Department as ApiDepartment
+from tripletex._api_types import Posting as ApiPosting
+from tripletex._api_types import Project as ApiProject
+
+
+SYNTHETIC_ACCOUNT_NUMBERS = (1500, 1900, 2400, 3000, 3010, 3090, 3100, 3220, 3290, 4000, 4010, 5000, 6300, 6800, 6900, 7100, 8050, 8072, 8150)
+
+
+def synthetic_departments() -> list[ApiDepartment]:
+    return [
+        {"id": 100 + i, "name": f"Avdeling {i}", "departmentNumber": str(i), "displayName": f"{i} Avdeling {i}", "isInactive": False}
+        for i in range(1, 12)
+    ]
+
+
+def synthetic_accounts() -> list[ApiAccount]:
+    return [
+        {"id": 10000 + number, "number": number, "name": f"Konto {number}", "description": None, "type": "OPERATING" if number >= 3000 else "ASSETS", "isInactive": False}
+        for number in SYNTHETIC_ACCOUNT_NUMBERS
+    ]
+
+
+def synthetic_projects() -> list[ApiProject]:
+    # Ten main projects, each with a number of sub projects.
+    result: list[ApiProject] = []
+    for i in range(1, 200):
+        parent = None if i <= 10 else {"id": 1000 + (i % 10) + 1, "number": str(20000 + (i % 10) + 1)}
+        result.append({
+            "id": 1000 + i,
+            "name": f"Prosjekt {i}",
+            "number": str(20000 + i),
+            "displayName": f"{20000 + i} Prosjekt {i}",
+            "startDate": "2014-01-01",
+            "endDate": None,
+            "mainProject": parent,
+        })
+    return result
+
+
+def synthetic_postings(count: int, date_start: str = "2014-01-01", date_to: str = "2024-01-01", seed: int = 1) -> list[ApiPosting]:
+    """Generate count postings spread over [date_start, date_to), sorted by date."""
+    rng = random.Random(seed)
+    start = datetime.date.fromisoformat(date_start)
+    days = (datetime.date.fromisoformat(date_to) - start).days
+
+    departments = [None] + [
+        {"id": department["id"], "name": department["name"], "departmentNumber": department["departmentNumber"]}
+        for department in synthetic_departments()
+    ]
+    projects = [None] + [
+        {"id": project["id"], "number": project["number"], "name": project["name"]}
+        for project in synthetic_projects()
+    ]
+    accounts = [
+        {"number": account["number"], "name": account["name"]}
+        for account in synthetic_accounts()
+    ]
+    descriptions = [None, "Salg kafé", "Salg bar", "Innkjøp varer", "Refusjon utlegg"]
+
+    # Like the real ledger, most postings hit a few projects and accounts.
+    project_weights = [1 / (rank + 1) for rank in range(len(projects))]
+    account_weights = [1 / (rank + 1) for rank in range(len(accounts))]
+
+    dates = sorted(start + datetime.timedelta(days=rng.randrange(days)) for _ in range(count))
+
+    result: list[ApiPosting] = []
+    voucher_number = 0
+    for i, date in enumerate(dates):
+        # A voucher usually holds a few postings.
+        if i % 3 == 0:
+            voucher_number += 1
+
+        result.append({
+            "id": i + 1,
+            "version": rng.randrange(3),
+            "account": rng.choices(accounts, account_weights)[0],
+            "amount": rng.randrange(-10000000, 10000000) / 100,
+            "date": date.isoformat(),
+            "department": rng.choice(departments),
+            "description": rng.choice(descriptions),
+            "voucher": {"number": voucher_number, "description": f"Bilag {voucher_number}", "year": date.year},
+            "project": rng.choices(projects, project_weights)[0],
+        })
+
+    return result
+
+
+def posting_page(values: list[ApiPosting], fields: Optional[list[str]] = None) -> dict[str, Any]:
+    """Wrap postings in a list response, optionally with only some fields."""
+    if fields is not None:
+        values = [{key: value[key] for key in fields if key in value} for value in values]
+
+    return {
+        "fullResultSize": len(values),
+        "from": 0,
+        "count": len(values),
+        "versionDigest": None,
+        "values": values,
+    }
+
+
+def posting_page_bytes(values: list[ApiPosting]) -> bytes:
+    return json.dumps(posting_page(values)).encode("utf-8")
+
+
+def split_fields(fields: str) -> list[str]:
+    """Top-level names of a Tripletex fields expression like "id,account(number,name)"."""
+    names = []
+    depth = 0
+    current = ""
+    for char in fields:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            names.append(current)
+            current = ""
+            continue
+        if depth == 0 and char != ")":
+            current += char
+    names.append(current)
+    return [name.strip() for name in names if name.strip()]
+
+
+class FakeTripletexServer:
+    """
+    Local stand-in for the Tripletex API, serving data from memory.
+
+    Serves /token/session/:create, /ledger/posting (with dateFrom/dateTo,
+    accountNumberFrom/accountNumberTo, from/count pagination and fields),
+    /department, /ledger/account and /project. latency is added to every
+    response, in seconds. Responses are gzipped when the client asks for it.
+
+    Use as a context manager and pass base_url to TripletexConnectorV2.
+    """
+
+    def __init__(
+        self,
+        postings: list[ApiPosting],
+        departments: Optional[list[ApiDepartment]] = None,
+        accounts: Optional[list[ApiAccount]] = None,
+        projects: Optional[list[ApiProject]] = None,
+        latency: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.postings = sorted(postings, key=lambda posting: posting["date"])
+        self._dates = [posting["date"] for posting in self.postings]
+        self.departments = departments if departments is not None else synthetic_departments()
+        self.accounts = accounts if accounts is not None else synthetic_accounts()
+        self.projects = projects if projects is not None else synthetic_projects()
+        self.latency = latency
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def synthetic(cls, count: int, latency: float = 0.0, **kwargs) -> FakeTripletexServer:
+        return cls(synthetic_postings(count, **kwargs), latency=latency)
+
+    @classmethod
+    def from_recording(cls, path: str, latency: float = 0.0) -> FakeTripletexServer:
+        """Load recorded list responses from a directory.
+
+        The directory holds the JSON bodies of /ledger/posting,
+        /department, /ledger/account and /project saved as postings.json,
+        departments.json, accounts.json and projects.json. Missing
+        reference data is replaced with synthetic data.
+        """
+        def load(name: str) -> Optional[list]:
+            filename = os.path.join(path, name)
+            if not os.path.exists(filename):
+                return None
+            with open(filename, "rb") as f:
+                return json.load(f)["values"]
+
+        return cls(
+            postings=load("postings.json") or [],
+            departments=load("departments.json"),
+            accounts=load("accounts.json"),
+            projects=load("projects.json"),
+            latency=latency,
+        )
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[0:2]
+        return f"http://{host}:{port}/v2"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> FakeTripletexServer:
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _ledger_posting(self, query: dict[str, str]) -> dict[str, Any]:
+        lo = bisect.bisect_left(self._dates, query.get("dateFrom", "0000-00-00"))
+        hi = bisect.bisect_left(self._dates, query.get("dateTo", "9999-99-99"))
+        account_start = int(query.get("accountNumberFrom", 0))
+        account_end = int(query.get("accountNumberTo", 9999))
+        from_ = int(query.get("from", 0))
+        count = int(query.get("count", 1000))
+
+        matching = [
+            posting for posting in self.postings[lo:hi]
+            if account_start <= posting["account"]["number"] <= account_end
+        ]
+        fields = split_fields(query["fields"]) if "fields" in query else None
+        page = posting_page(matching[from_:from_ + count], fields)
+        page["fullResultSize"] = len(matching)
+        page["from"] = from_
+        return page
+
+    def _handle(self, method: str, path: str, query: dict[str, str]) -> Optional[dict[str, Any]]:
+        if method == "PUT" and path == "/v2/token/session/:create":
+            return {"value": {"token": "fake-session-token", "expirationDate": query.get("expirationDate")}}
+        if method != "GET":
+            return None
+        if path == "/v2/ledger/posting":
+            return self._ledger_posting(query)
+        if path == "/v2/department":
+            return {"count": len(self.departments), "values": self.departments}
+        if path == "/v2/ledger/account":
+            return {"count": len(self.accounts), "values": self.accounts}
+        if path == "/v2/project":
+            return {"count": len(self.projects), "values": self.projects}
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, so avoid waiting
+            # for delayed ACKs between them on keep-alive connections.
+            disable_nagle_algorithm = True
+
+            def _respond(self, method: str):
+                url = urlsplit(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+                with server._lock:
+                    server.request_count += 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                data = server._handle(method, url.path, query)
+                if data is None:
+                    self.send_error(404)
+                    return
+
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, compresslevel=1)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_PUT(self):
+                self._respond("PUT")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -2,20 +2,45 @@ from __future__ import annotations
 
 import base64
 import datetime
+import json
 import logging
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, Optional, Tuple, TypedDict, Union
+from typing import (TYPE_CHECKING, Any, Callable, Deque, Dict, Iterable,
+                    Iterator, Optional, Tuple, TypedDict, Union)
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from tripletex._api_types import (ListResponseAccount, ListResponseDepartment,
                                   ListResponsePosting, ListResponseProject)
 from tripletex._api_types import Posting as ApiPosting
+from tripletex._utils import RateLimiter, none_for_empty, split_date_range, str_to_int
+from tripletex.metrics import Metrics, endpoint_of, maybe_span
+from tripletex.session_token import get_session_token_provider
+
+if TYPE_CHECKING:
+    from tripletex.ledger_store import LedgerStore
 
 logger = logging.getLogger(__name__)
 
 
+BASE_URL = "https://tripletex.no/v2"
+
+POSTING_FIELDS = "id,account(number,name),amount,date,department(id,name,departmentNumber),description,voucher(number,description,year),project(id,number,name)"
+
+
+# Postings are fetched in pages of this size, at most this many pages per range.
+POSTING_PAGE_SIZE = 10000
+POSTING_MAX_PAGES = 10
+
+
+def posting_page_path(date_start: str, date_to: str, account_start: int, account_end: int, from_: int, count: int, fields: str) -> str:
+    return f"/ledger/posting?dateFrom={date_start}&dateTo={date_to}&accountNumberFrom={account_start}&accountNumberTo={account_end}&count={count}&from={from_}&fields={fields}"
+
+
 def raise_for_status_pretty(response: requests.Response):
     try:
         response.raise_for_status()
@@ -42,21 +67,167 @@ class Account:
     active: bool
 
 
-@dataclass
+class PostingDimensions:
+    """
+    Lookup tables for the values repeated on many postings.
+
+    Each distinct account, department, project and voucher is stored once,
+    and postings only keep an integer key into these tables. Descriptions
+    are interned so equal texts share one string.
+    """
+
+    def __init__(self):
+        self.accounts: list[Tuple[int, str]] = []
+        self.departments: list[Tuple[Optional[int], Optional[str]]] = []
+        self.projects: list[Tuple[Optional[int], Optional[str], Optional[int]]] = []
+        self.vouchers: list[Tuple[int, int, Optional[str]]] = []
+        self._keys: Dict[Tuple[str, tuple], int] = {}
+        self._texts: Dict[str, str] = {}
+
+    def key(self, table: str, value: tuple) -> int:
+        key = self._keys.get((table, value))
+        if key is None:
+            values = getattr(self, table)
+            key = len(values)
+            values.append(value)
+            self._keys[(table, value)] = key
+        return key
+
+    def text(self, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        return self._texts.setdefault(value, value)
+
+
 class Posting:
-    date: datetime.date
-    description: Optional[str]
-    amount: float
-    voucher_number: int
-    voucher_year: int
-    voucher_description: Optional[str]
-    department_name: Optional[str]
-    department_number: Optional[int]
-    account_name: str
-    account_number: int
-    project_id: Optional[int]
-    project_name: Optional[str]
-    project_number: Optional[int]
+    """
+    A single ledger posting.
+
+    The names of account, department, project and voucher are kept in a
+    PostingDimensions table, and the attributes for them are read-only
+    properties looking up in that table. Postings decoded together share
+    one table, created per fetch or decode call. A posting created without
+    dimensions gets its own table.
+    """
+
+    __slots__ = ("date", "description", "amount", "id", "_account", "_department", "_project", "_voucher", "_dimensions")
+
+    FIELDS = (
+        "date",
+        "description",
+        "amount",
+        "voucher_number",
+        "voucher_year",
+        "voucher_description",
+        "department_name",
+        "department_number",
+        "account_name",
+        "account_number",
+        "project_id",
+        "project_name",
+        "project_number",
+        "id",
+    )
+
+    def __init__(
+        self,
+        date: datetime.date,
+        description: Optional[str],
+        amount: float,
+        voucher_number: int,
+        voucher_year: int,
+        voucher_description: Optional[str],
+        department_name: Optional[str],
+        department_number: Optional[int],
+        account_name: str,
+        account_number: int,
+        project_id: Optional[int],
+        project_name: Optional[str],
+        project_number: Optional[int],
+        id: Optional[int] = None,
+        dimensions: Optional[PostingDimensions] = None,
+    ):
+        if dimensions is None:
+            dimensions = PostingDimensions()
+
+        self.date = date
+        self.description = dimensions.text(description)
+        self.amount = amount
+        self.id = id
+        self._account = dimensions.key("accounts", (account_number, account_name))
+        self._department = dimensions.key("departments", (department_number, department_name))
+        self._project = dimensions.key("projects", (project_id, project_name, project_number))
+        self._voucher = dimensions.key("vouchers", (voucher_number, voucher_year, voucher_description))
+        self._dimensions = dimensions
+
+    @classmethod
+    def _from_keys(cls, date: datetime.date, description: Optional[str], amount: float, id: Optional[int], account: int, department: int, project: int, voucher: int, dimensions: PostingDimensions) -> Posting:
+        """Create a posting from keys already in dimensions, skipping the lookups."""
+        posting = cls.__new__(cls)
+        posting.date = date
+        posting.description = description
+        posting.amount = amount
+        posting.id = id
+        posting._account = account
+        posting._department = department
+        posting._project = project
+        posting._voucher = voucher
+        posting._dimensions = dimensions
+        return posting
+
+    @property
+    def account_number(self) -> int:
+        return self._dimensions.accounts[self._account][0]
+
+    @property
+    def account_name(self) -> str:
+        return self._dimensions.accounts[self._account][1]
+
+    @property
+    def department_number(self) -> Optional[int]:
+        return self._dimensions.departments[self._department][0]
+
+    @property
+    def department_name(self) -> Optional[str]:
+        return self._dimensions.departments[self._department][1]
+
+    @property
+    def project_id(self) -> Optional[int]:
+        return self._dimensions.projects[self._project][0]
+
+    @property
+    def project_name(self) -> Optional[str]:
+        return self._dimensions.projects[self._project][1]
+
+    @property
+    def project_number(self) -> Optional[int]:
+        return self._dimensions.projects[self._project][2]
+
+    @property
+    def voucher_number(self) -> int:
+        return self._dimensions.vouchers[self._voucher][0]
+
+    @property
+    def voucher_year(self) -> int:
+        return self._dimensions.vouchers[self._voucher][1]
+
+    @property
+    def voucher_description(self) -> Optional[str]:
+        return self._dimensions.vouchers[self._voucher][2]
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.FIELDS)
+
+    def __eq__(self, other):
+        if not isinstance(other, Posting):
+            return NotImplemented
+        return self._values() == other._values()
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"Posting({fields})"
 
 
 @dataclass
@@ -83,19 +254,219 @@ PostingAggregate = Union[
 ]
 
 
+class PostingDecoder:
+    """
+    Decodes response bodies from /ledger/posting.
+
+    decode_page returns the count and rows of a page, to_posting converts
+    a row to a Posting and id_version gives what LedgerStore digests.
+    This default uses the json module from the standard library.
+    """
+
+    name = "json"
+
+    def decode_page(self, content: bytes) -> Tuple[int, list[Any]]:
+        page_data: ListResponsePosting = json.loads(content)
+        return page_data["count"], page_data["values"]
+
+    def id_version(self, row: ApiPosting) -> Tuple[int, int]:
+        return row["id"], row.get("version") or 0
+
+    def to_posting(self, row: ApiPosting, dimensions: Optional[PostingDimensions] = None) -> Posting:
+        id = row['id']
+
+        voucher = row['voucher']
+        if voucher is None:
+            raise ValueError(f"Missing voucher for posting {id}")
+
+        account = row['account']
+        if account is None:
+            raise ValueError(f"Missing account for posting {id}")
+
+        project = row['project']
+
+        return Posting(
+            date=datetime.date.fromisoformat(row["date"]),
+            description=row['description'],
+            amount=float(row['amount']),
+            voucher_number=voucher['number'],
+            voucher_year=voucher['year'],
+            voucher_description=none_for_empty(voucher['description']),
+            department_name=none_for_empty(row['department']['name']) if row['department'] is not None else None,
+            department_number=str_to_int(none_for_empty(row['department']['departmentNumber'])) if row['department'] is not None else None,
+            account_name=account['name'],
+            account_number=account['number'],
+            project_id=project['id'] if project else None,
+            project_name=project['name'] if project else None,
+            project_number=str_to_int(project['number']) if project else None,
+            id=id,
+            dimensions=dimensions,
+        )
+
+
+class OrjsonPostingDecoder(PostingDecoder):
+    """Same as PostingDecoder, but parses with orjson."""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._loads = orjson.loads
+
+    def decode_page(self, content: bytes) -> Tuple[int, list[Any]]:
+        page_data: ListResponsePosting = self._loads(content)
+        return page_data["count"], page_data["values"]
+
+
+class MsgspecPostingDecoder(PostingDecoder):
+    """
+    Decodes pages with msgspec into typed structs mirroring the API types,
+    so no intermediate dicts are built.
+    """
+
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        from tripletex import _api_structs
+        self._decoder = msgspec.json.Decoder(_api_structs.ListResponsePosting)
+
+    def decode_page(self, content: bytes) -> Tuple[int, list[Any]]:
+        page_data = self._decoder.decode(content)
+        return page_data.count, page_data.values
+
+    def id_version(self, row) -> Tuple[int, int]:
+        return row.id, row.version
+
+    def to_posting(self, row, dimensions: Optional[PostingDimensions] = None) -> Posting:
+        voucher = row.voucher
+        if voucher is None:
+            raise ValueError(f"Missing voucher for posting {row.id}")
+
+        account = row.account
+        if account is None:
+            raise ValueError(f"Missing account for posting {row.id}")
+
+        department = row.department
+        project = row.project
+
+        return Posting(
+            date=datetime.date.fromisoformat(row.date),
+            description=row.description,
+            amount=row.amount,
+            voucher_number=voucher.number,
+            voucher_year=voucher.year,
+            voucher_description=none_for_empty(voucher.description),
+            department_name=none_for_empty(department.name) if department is not None else None,
+            department_number=str_to_int(none_for_empty(department.departmentNumber)) if department is not None else None,
+            account_name=account.name,
+            account_number=account.number,
+            project_id=project.id if project else None,
+            project_name=project.name if project else None,
+            project_number=str_to_int(project.number) if project else None,
+            id=row.id,
+            dimensions=dimensions,
+        )
+
+
+POSTING_DECODERS: Dict[str, Callable[[], PostingDecoder]] = {
+    "json": PostingDecoder,
+    "orjson": OrjsonPostingDecoder,
+    "msgspec": MsgspecPostingDecoder,
+}
+
+
+def get_posting_decoder(decoder: Union[str, PostingDecoder]) -> PostingDecoder:
+    """Look up a decoder by name, or pass through a decoder instance."""
+    if isinstance(decoder, PostingDecoder):
+        return decoder
+    if decoder not in POSTING_DECODERS:
+        raise ValueError(f"Unknown posting decoder: {decoder}")
+    return POSTING_DECODERS[decoder]()
+
+
+def decode_posting_page(decoder: PostingDecoder, content: bytes, metrics: Optional[Metrics]) -> Tuple[int, list[Any]]:
+    """decoder.decode_page, recording its time and rows in metrics."""
+    with maybe_span(metrics, "tripletex_posting_decode", decoder=decoder.name):
+        this_count, values = decoder.decode_page(content)
+    if metrics is not None:
+        metrics.count("tripletex_posting_rows", len(values), decoder=decoder.name)
+    return this_count, values
+
+
 class TripletexConnectorV2:
     """
     This class has the support role of communicating with Tripletex.
+
+    All calls go through one pooled `requests.Session`, so a full refresh
+    reuses a few keep-alive connections instead of opening a new TLS
+    connection per request. Idempotent GET requests are retried on
+    connection errors and 429/5xx responses.
+
+    Set max_requests_per_second to throttle calls, e.g. when fetching
+    with several threads in parallel. base_url can point to another
+    server, such as tripletex.testing.FakeTripletexServer.
+
+    Session tokens are shared by all connectors in the process with the
+    same credentials, and with other processes through the file at
+    token_cache_path, see tripletex.session_token.
+
+    Requests are timed into metrics if given, see tripletex.metrics.
     """
 
-    def __init__(self, customer_token: str, employee_token: str):
+    def __init__(
+        self,
+        customer_token: str,
+        employee_token: str,
+        pool_size: int = 10,
+        max_retries: int = 3,
+        timeout: Optional[float] = 120,
+        max_requests_per_second: Optional[float] = None,
+        base_url: str = BASE_URL,
+        token_cache_path: Optional[str] = None,
+        metrics: Optional[Metrics] = None,
+    ):
         self.customer_token = customer_token
         self.employee_token = employee_token
-        self.session_token_cache: Optional[Tuple(datetime.date, str)] = None
+        self.timeout = timeout
+        self.base_url = base_url
+        self.metrics = metrics
+        self.rate_limiter = RateLimiter(max_requests_per_second) if max_requests_per_second else None
+        self.token_provider = get_session_token_provider(base_url, customer_token, employee_token, path=token_cache_path)
+        self.session = self._create_http_session(pool_size=pool_size, max_retries=max_retries)
 
     @staticmethod
-    def _compute_expiration_date() -> datetime.date:
-        return datetime.date.today() + datetime.timedelta(days=2)
+    def _create_http_session(pool_size: int, max_retries: int) -> requests.Session:
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+            # Let raise_for_status_pretty report the final response.
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        return session
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self) -> TripletexConnectorV2:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def _authorization_header_value(self) -> str:
         session_token = self._get_session_token()
@@ -103,52 +474,65 @@ class TripletexConnectorV2:
         return "Basic {}".format(basic_value)
 
     def _get_session_token(self) -> str:
-        expiration_date = self._compute_expiration_date()
-
-        if self.session_token_cache is None or self.session_token_cache[0] != expiration_date:
-            self.session_token_cache = (expiration_date, self._create_session_token(expiration_date))
-
-        return self.session_token_cache[1]
+        return self.token_provider.get(self._create_session_token)
 
     def _create_session_token(self, expiration_date) -> str:
         logger.info("Creating session token")
 
-        url = f"https://tripletex.no/v2/token/session/:create?consumerToken={self.customer_token}&employeeToken={self.employee_token}&expirationDate={expiration_date}"
-        response = requests.request("PUT", url)
+        url = f"{self.base_url}/token/session/:create?consumerToken={self.customer_token}&employeeToken={self.employee_token}&expirationDate={expiration_date}"
+        with maybe_span(self.metrics, "tripletex_session_token_create"):
+            response = self.session.request("PUT", url, timeout=self.timeout)
         raise_for_status_pretty(response)
 
         return response.json()["value"]["token"]
 
     def call_api(self, method: str, path: str, *args, **kwargs) -> requests.Response:
-        headers = kwargs.get("headers", {}).copy()
+        headers = kwargs.pop("headers", {}).copy()
         headers["authorization"] = self._authorization_header_value()
+        kwargs.setdefault("timeout", self.timeout)
 
-        url = f"https://tripletex.no/v2{path}"
+        url = f"{self.base_url}{path}"
 
-        return requests.request(method, url, *args, **kwargs, headers=headers)
+        if self.rate_limiter is not None:
+            with maybe_span(self.metrics, "tripletex_rate_limit_wait"):
+                self.rate_limiter.wait()
+
+        endpoint = endpoint_of(path)
+        with maybe_span(self.metrics, "tripletex_http_request", method=method, endpoint=endpoint, status="error") as labels:
+            response = self.session.request(method, url, *args, **kwargs, headers=headers)
+            labels["status"] = response.status_code
+
+        if self.metrics is not None:
+            self.metrics.count("tripletex_http_response_bytes", len(response.content), method=method, endpoint=endpoint)
+        return response
 
 
 class Tripletex:
-    def __init__(self, context_id: int, connector: TripletexConnectorV2):
+    def __init__(self, context_id: int, connector: TripletexConnectorV2, decoder: Union[str, PostingDecoder] = "json"):
+        """
+        decoder selects how ledger pages are parsed: "json" (default),
+        "orjson" or "msgspec". The latter two need the optional "fast"
+        dependencies.
+        """
         self.context_id = context_id
         self.connector = connector
+        self.decoder = get_posting_decoder(decoder)
+        self.metrics = getattr(connector, "metrics", None)
 
-    def _get_all_postings(self, date_start: str, date_to: str, account_start: int, account_end: int) -> list[ApiPosting]:
-        result = []
+    def _iter_posting_pages(self, date_start: str, date_to: str, account_start: int, account_end: int, fields: str = POSTING_FIELDS) -> Iterator[list[Any]]:
         from_ = 0
-        max_page_size = 10000
-        fields = "id,account(number,name),amount,date,department(id,name,departmentNumber),description,voucher(number,description,year),project(id,number,name)"
+        max_page_size = POSTING_PAGE_SIZE
 
         # Have a limit just in case the pagination stops working.
-        max_iter = 10
+        max_iter = POSTING_MAX_PAGES
         while True:
-            response = self.connector.call_api("GET", f"/ledger/posting?dateFrom={date_start}&dateTo={date_to}&accountNumberFrom={account_start}&accountNumberTo={account_end}&count={max_page_size}&from={from_}&fields={fields}")
-            raise_for_status_pretty(response)
+            with maybe_span(self.metrics, "tripletex_posting_page", page=POSTING_MAX_PAGES - max_iter):
+                response = self.connector.call_api("GET", posting_page_path(date_start, date_to, account_start, account_end, from_, max_page_size, fields))
+                raise_for_status_pretty(response)
 
-            page_data: ListResponsePosting = response.json()
-            this_count = page_data["count"]
+                this_count, values = decode_posting_page(self.decoder, response.content, self.metrics)
             from_ += this_count
-            result.extend(page_data["values"])
+            yield values
 
             if this_count < max_page_size:
                 break
@@ -159,54 +543,91 @@ class Tripletex:
 
             logger.info("Fetching next page of ledger items")
 
+    def _get_all_postings(self, date_start: str, date_to: str, account_start: int, account_end: int, fields: str = POSTING_FIELDS) -> list[Any]:
+        result = []
+        for page in self._iter_posting_pages(date_start=date_start, date_to=date_to, account_start=account_start, account_end=account_end, fields=fields):
+            result.extend(page)
         return result
 
-    def get_postings(self, date_start: str, date_to: str, account_start: Optional[int] = None, account_end: Optional[int] = None) -> list[Posting]:
-        items = self._get_all_postings(date_start=date_start, date_to=date_to, account_start=account_start or 0, account_end=account_end or 9999)
-
-        def none_for_empty(value: Optional[str]):
-            if value == "":
-                return None
-            return value
-
-        def str_to_int(value: Optional[str]):
-            if value is not None:
-                return int(value)
-
-        result: list[Posting] = []
-        for row in items:
-            id = row['id']
-
-            voucher = row['voucher']
-            if voucher is None:
-                raise ValueError(f"Missing voucher for posting {id}")
-
-            account = row['account']
-            if account is None:
-                raise ValueError(f"Missing account for posting {id}")
-
-            project = row['project']
-
-            result.append(Posting(
-                date=datetime.date.fromisoformat(row["date"]),
-                description=row['description'],
-                amount=float(row['amount']),
-                voucher_number=voucher['number'],
-                voucher_year=voucher['year'],
-                voucher_description=none_for_empty(voucher['description']),
-                department_name=none_for_empty(row['department']['name']) if row['department'] is not None else None,
-                department_number=str_to_int(none_for_empty(row['department']['departmentNumber'])) if row['department'] is not None else None,
-                account_name=account['name'],
-                account_number=account['number'],
-                project_id=project['id'] if project else None,
-                project_name=project['name'] if project else None,
-                project_number=str_to_int(project['number']) if project else None,
-            ))
-
-        return result
+    def _convert_posting(self, row: Any, dimensions: Optional[PostingDimensions] = None) -> Posting:
+        return self.decoder.to_posting(row, dimensions)
+
+    def _iter_posting_pages_sharded(self, date_start: str, date_to: str, account_start: int, account_end: int, shard: str, max_workers: int) -> Iterator[list[ApiPosting]]:
+        windows = split_date_range(date_start, date_to, shard)
+        logger.info(f"Fetching ledger in {len(windows)} windows using {max_workers} workers")
+
+        def fetch(window: Tuple[str, str]) -> list[ApiPosting]:
+            return self._get_all_postings(date_start=window[0], date_to=window[1], account_start=account_start, account_end=account_end)
+
+        # Only keep max_workers windows in flight, so memory is bounded by
+        # the windows being fetched and not by the full range. Windows are
+        # yielded in submission order, i.e. by date.
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending: Deque[Future[list[ApiPosting]]] = deque()
+            try:
+                for window in windows:
+                    pending.append(executor.submit(fetch, window))
+                    if len(pending) >= max_workers:
+                        yield pending.popleft().result()
+
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def iter_postings(
+        self,
+        date_start: str,
+        date_to: str,
+        account_start: Optional[int] = None,
+        account_end: Optional[int] = None,
+        shard: Optional[str] = None,
+        max_workers: int = 4,
+    ) -> Iterator[Posting]:
+        """Yield postings in [date_start, date_to) page by page.
+
+        Only the page being converted is kept in memory, or the windows in
+        flight when shard is given. See get_postings for the arguments.
+        """
+        if shard is None:
+            pages = self._iter_posting_pages(date_start=date_start, date_to=date_to, account_start=account_start or 0, account_end=account_end or 9999)
+        else:
+            pages = self._iter_posting_pages_sharded(date_start=date_start, date_to=date_to, account_start=account_start or 0, account_end=account_end or 9999, shard=shard, max_workers=max_workers)
+
+        dimensions = PostingDimensions()
+        for page in pages:
+            for row in page:
+                yield self._convert_posting(row, dimensions)
+
+    def get_postings(
+        self,
+        date_start: str,
+        date_to: str,
+        account_start: Optional[int] = None,
+        account_end: Optional[int] = None,
+        shard: Optional[str] = None,
+        max_workers: int = 4,
+        store: Optional[LedgerStore] = None,
+    ) -> list[Posting]:
+        """Fetch postings in [date_start, date_to).
+
+        If shard is "month" or "week" the range is split into windows of
+        that size which are fetched concurrently by max_workers threads.
+        The result is still ordered by date.
+
+        If store is given, the store is first synced incrementally for the
+        range and the postings are read back from it. The range must then
+        be aligned to months.
+        """
+        if store is not None:
+            store.sync(self, date_start=date_start, date_to=date_to, max_workers=max_workers)
+            return store.get_postings(date_start=date_start, date_to=date_to, account_start=account_start, account_end=account_end)
+
+        return list(self.iter_postings(date_start=date_start, date_to=date_to, account_start=account_start, account_end=account_end, shard=shard, max_workers=max_workers))
 
     @staticmethod
-    def aggregate_postings(postings: list[Posting], *aggregators: Callable[[Posting], Union[bool, Tuple[str, Any]]]) -> PostingAggregate:
+    def aggregate_postings(postings: Iterable[Posting], *aggregators: Callable[[Posting], Union[bool, Tuple[str, Any]]]) -> PostingAggregate:
         result = OrderedDict()
         default_data = {'in': 0, 'out': 0}
 
@@ -241,8 +662,10 @@ class Tripletex:
         response = self.connector.call_api("GET", "/department?count=10000")
         raise_for_status_pretty(response)
 
-        data: ListResponseDepartment = response.json()
+        return self._parse_departments(response.json())
 
+    @staticmethod
+    def _parse_departments(data: ListResponseDepartment) -> list[Department]:
         department_list: list[Department] = []
 
         for department in data['values']:
@@ -262,8 +685,10 @@ class Tripletex:
     def get_accounts(self) -> list[Account]:
         response = self.connector.call_api("GET", "/ledger/account?count=10000")
         raise_for_status_pretty(response)
-        data: ListResponseAccount = response.json()
+        return self._parse_accounts(response.json())
 
+    @staticmethod
+    def _parse_accounts(data: ListResponseAccount) -> list[Account]:
         account_list: list[Account] = []
 
         for account in data["values"]:
@@ -279,8 +704,10 @@ class Tripletex:
     def get_projects(self) -> list[Project]:
         response = self.connector.call_api("GET", "/project?count=10000")
         raise_for_status_pretty(response)
-        data: ListResponseProject = response.json()
+        return self._parse_projects(response.json())
 
+    @staticmethod
+    def _parse_projects(data: ListResponseProject) -> list[Project]:
         project_list: list[Project] = []
 
         for project in data["values"]:
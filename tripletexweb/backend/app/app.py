@@ -1,12 +1,22 @@
+import datetime
 import html
 import os
+import sqlite3
 import sys
+import tempfile
 
 from dotenv import load_dotenv
 
+import artifacts
 import fetch_budget_data
 import fetch_tripletex_data
-from flask import Flask, Response, request, send_from_directory
+import jobs
+import ledger_query
+import refresh_metrics
+import scheduler
+import snapshots
+from tripletex.metrics import Metrics
+from flask import Flask, Response, abort, jsonify, request
 from flask_cors import CORS
 
 load_dotenv()
@@ -23,11 +33,28 @@ employee_token = require_env("TRIPLETEX_EMPLOYEE_TOKEN")
 budget_credentials_file = os.environ.get("OKOREPORTS_BUDGET_CREDENTIALS_FILE", None)
 budget_spreadsheet_id = os.environ.get("OKOREPORTS_BUDGET_SPREADSHEET_ID", None)
 
+tripletex_base_url = os.environ.get("TRIPLETEX_BASE_URL", None)
+
 reports_path = os.environ.get("REPORTS_DIR", os.getcwd() + "/reports/")
 
 if not os.path.exists(reports_path):
     raise RuntimeError(f"Path {reports_path} does not exist")
 
+# Each refresh writes a new snapshot of the reports, see snapshots.py.
+# The ledger store and other caches stay in reports_path itself.
+report_snapshots = snapshots.Snapshots(
+    reports_path,
+    keep=int(os.environ.get("KEEP_SNAPSHOTS", snapshots.KEEP_SNAPSHOTS)),
+    skip=('*.sqlite*', '*.tmp', '*.lock', 'aggregated-previous*', 'budget-cache.json'),
+)
+
+# Job status is shared between the gunicorn workers through this directory.
+jobs_path = os.environ.get("JOBS_DIR", os.path.join(tempfile.gettempdir(), "okoreports-jobs"))
+job_queue = jobs.JobQueue(jobs_path)
+
+# Refresh the accounting data in the background every N minutes, if set.
+refresh_interval_minutes = int(os.environ.get("REFRESH_INTERVAL_MINUTES", "0"))
+
 app = Flask(__name__)
 
 CORS(
@@ -36,47 +63,140 @@ CORS(
     supports_credentials=True
 )
 
-def get_output(title, data):
+def get_output(title, data, head='', back_url='../', status=200):
     ret = """<!DOCTYPE html>
 <html>
   <head>
-    <title>""" + html.escape(title) + """</title>
+    <title>""" + html.escape(title) + """</title>""" + head + """
   </head>
   <body>
     <h1>""" + html.escape(title) + """</h1>
-    <p><a href="../">Tilbake</a></p>
+    <p><a href=\"""" + html.escape(back_url) + """\">Tilbake</a></p>
     <p><pre>""" + html.escape(data) + """</pre></p>
   </body>
 </html>"""
 
-    return Response(ret, mimetype='text/html')
+    return Response(ret, mimetype='text/html', status=status)
+
+def wants_json():
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+def get_job_output(job, status=200):
+    if wants_json():
+        return jsonify(job), status
+
+    data = 'Jobb %s: %s\n\n' % (job['id'], job['status'])
+    data += '\n'.join(job['progress'])
+    head = ''
+    if job['status'] in (jobs.QUEUED, jobs.RUNNING):
+        # Reload the status page until the job is finished.
+        head = '\n    <meta http-equiv="refresh" content="2; url=/api/jobs/%s">' % job['id']
+    elif job['output']:
+        data += '\n\n' + job['output']
+
+    return get_output(job['title'], data, head=head, back_url='/', status=status)
+
+def publishing(key, func):
+    """
+    Run func(snapshot_path, progress, metrics) in a new snapshot, and publish
+    it with the query index and compressed copies of the changed reports.
+    The timings are kept in the job status and added to /metrics.
+    """
+    def job(progress):
+        metrics = Metrics()
+        succeeded = False
+        try:
+            with metrics.span('refresh'):
+                with report_snapshots.build() as snapshot_path:
+                    output = func(snapshot_path, progress, metrics).rstrip('\n') + '\n'
+                    with metrics.span('refresh_stage', stage='index'):
+                        output += 'Indexed %d ledger cells for queries\n' % ledger_query.build(snapshot_path)
+                    with metrics.span('refresh_stage', stage='compress'):
+                        output += 'Compressed %d changed reports\n' % artifacts.publish_reports(snapshot_path)
+            output += 'Published snapshot %s\n' % report_snapshots.current_name()
+            output += 'Time per stage: %s\n' % refresh_metrics.stage_summary(metrics)
+            succeeded = True
+        finally:
+            refresh_metrics.record(jobs_path, key, metrics, succeeded)
+        return {'output': output, 'timings': metrics.to_dict()}
+    return job
+
+def enqueue(key, title, func):
+    job_id = job_queue.enqueue(key, title, publishing(key, func))
+    return get_job_output(job_queue.get(job_id), status=202)
 
 @app.route("/api/fetch-budget")
 def fetch_budget():
-    result = fetch_budget_data.run(
+    return enqueue('budget', 'Oppdatering av budsjettdata', lambda snapshot_path, progress, metrics: fetch_budget_data.run(
         spreadsheet_id=budget_spreadsheet_id,
         credentials_file=budget_credentials_file,
-        reports_path=reports_path,
-    )
-    return get_output('Oppdatering av budsjettdata', result)
+        reports_path=snapshot_path,
+        metrics=metrics,
+        cache_path=reports_path,
+    ))
+
+def enqueue_accounting(drop_cache=False):
+    # A drop_cache refresh gets its own key, so it is never merged into a
+    # normal refresh that is already queued or running. Both write the same
+    # ledger store, but each runs inside report_snapshots.build(), which
+    # holds the snapshot lock, so they run one after the other.
+    key = 'accounting-drop-cache' if drop_cache else 'accounting'
+    title = 'Oppdatering av regnskapsdata (uten mellomlager)' if drop_cache else 'Oppdatering av regnskapsdata'
+    return job_queue.enqueue(key, title, publishing('accounting', lambda snapshot_path, progress, metrics: fetch_tripletex_data.run(
+        context_id=context_id,
+        customer_token=customer_token,
+        employee_token=employee_token,
+        reports_path=snapshot_path,
+        drop_cache=drop_cache,
+        tripletex_base_url=tripletex_base_url,
+        progress=progress,
+        cache_path=reports_path,
+        metrics=metrics,
+    )))
 
 @app.route("/api/fetch-accounting")
 def fetch_accounting():
     drop_cache = False
     if 'drop_cache' in request.args:
         drop_cache = True
-    result = fetch_tripletex_data.run(
-        context_id=context_id,
-        customer_token=customer_token,
-        employee_token=employee_token,
-        reports_path=reports_path,
-        drop_cache=drop_cache,
-    )
-    return get_output('Oppdatering av regnskapsdata', result)
+    job_id = enqueue_accounting(drop_cache=drop_cache)
+    return get_job_output(job_queue.get(job_id), status=202)
+
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404)
+    return get_job_output(job)
+
+@app.route("/api/ledger")
+def ledger():
+    try:
+        return jsonify(ledger_query.query(report_snapshots.current_path(), request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.OperationalError:
+        # The index is built by the first refresh.
+        abort(404)
+
+@app.route("/api/projects")
+def projects():
+    try:
+        return jsonify(ledger_query.projects(report_snapshots.current_path()))
+    except sqlite3.OperationalError:
+        abort(404)
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(refresh_metrics.render(jobs_path), mimetype='text/plain; version=0.0.4')
 
 @app.route('/reports/<path:path>')
 def reports(path):
-    return send_from_directory(reports_path, path)
+    # REPORTS_DIR itself holds the ledger store and other caches, so only
+    # a published snapshot is served.
+    if report_snapshots.current_name() is None:
+        abort(404)
+    return artifacts.send_report(report_snapshots.current_path(), path)
 
 @app.after_request
 def add_header(response):
@@ -85,5 +205,12 @@ def add_header(response):
     response.cache_control.max_age = 0
     return response
 
+if refresh_interval_minutes > 0:
+    scheduler.Scheduler(
+        state_path=os.path.join(jobs_path, 'scheduler-accounting.txt'),
+        interval=datetime.timedelta(minutes=refresh_interval_minutes),
+        job=enqueue_accounting,
+    ).start()
+
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=8000)
@@ -0,0 +1,113 @@
+"""
+Precompressed report files with strong ETags.
+
+After a refresh, publish_reports writes a gzip (and brotli, if installed)
+copy of every changed report next to it, together with a .etag file
+holding the SHA-256 of the content. send_report serves the best encoding
+the client accepts, and answers conditional requests with 304.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import uuid
+from typing import Optional
+
+from flask import Response, abort, request, send_file, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Suffixes of the files written next to each report, and other files
+# in the reports directory that are not served as reports.
+ARTIFACT_SUFFIXES = ('.gz', '.br', '.etag', '.tmp')
+PRIVATE_SUFFIXES = ('.sqlite', '.sqlite-journal', '.sqlite-wal', '.sqlite-shm')
+
+# Content-Encoding, file suffix and compression, in order of preference.
+ENCODINGS = (
+    ('br', '.br', (lambda data: brotli.compress(data, quality=11)) if brotli is not None else None),
+    ('gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)),
+)
+
+
+def write_atomic(path: str, data: bytes):
+    # The temporary file is unique, as another worker or a refresh job may
+    # write the same file at the same time.
+    tmp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_etag(path: str) -> Optional[str]:
+    """The ETag of a published report, or None if it changed since."""
+    try:
+        with open(path + '.etag', 'r') as f:
+            etag = f.read().strip()
+        if os.path.getmtime(path + '.etag') < os.path.getmtime(path):
+            return None
+    except FileNotFoundError:
+        return None
+    return etag
+
+
+def publish(path: str) -> bool:
+    """Write the compressed copies and ETag of a report. Returns False if unchanged."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    etag = hashlib.sha256(data).hexdigest()
+
+    if read_etag(path) == etag:
+        return False
+
+    for _, suffix, compress in ENCODINGS:
+        if compress is not None:
+            write_atomic(path + suffix, compress(data))
+
+    # Written last, so the copies are in place once the ETag is valid.
+    write_atomic(path + '.etag', etag.encode('ascii'))
+    return True
+
+
+def publish_reports(reports_path: str) -> int:
+    """Publish all changed reports in reports_path, returning how many."""
+    count = 0
+    for name in sorted(os.listdir(reports_path)):
+        path = os.path.join(reports_path, name)
+        if name.endswith(ARTIFACT_SUFFIXES + PRIVATE_SUFFIXES) or not os.path.isfile(path):
+            continue
+        if publish(path):
+            count += 1
+    return count
+
+
+def send_report(reports_path: str, name: str) -> Response:
+    # The databases are only used by the backend itself.
+    if name.endswith(PRIVATE_SUFFIXES):
+        abort(404)
+
+    path = safe_join(reports_path, name)
+    etag = read_etag(path) if path is not None and os.path.isfile(path) else None
+    if etag is None:
+        # Not published (yet), serve it as a plain file.
+        return send_from_directory(reports_path, name)
+
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    accepted = request.accept_encodings
+    for encoding, suffix, compress in ENCODINGS:
+        if compress is not None and accepted[encoding] and os.path.isfile(path + suffix):
+            response = send_file(path + suffix, mimetype=mimetype, etag='%s-%s' % (etag, encoding), conditional=True)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_file(path, mimetype=mimetype, etag=etag, conditional=True)
+
+    response.vary.add('Accept-Encoding')
+    return response
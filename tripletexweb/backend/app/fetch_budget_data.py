@@ -1,9 +1,38 @@
 import csv
+import hashlib
+import io
+import json
+import logging
+import os
 import re
+from typing import Any, Optional
 
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 
+from tripletex.metrics import Metrics, maybe_span
+
+from report_columns import ReportColumns
+
+logger = logging.getLogger(__name__)
+
+# Per sheet hash and rows of the last fetch, and the Drive version of the
+# spreadsheet, so unchanged sheets are not converted again and an
+# unchanged spreadsheet is not fetched at all.
+BUDGET_CACHE = 'budget-cache.json'
+
+BUDGET_HEADER = [
+    'Type',
+    'Versjon',
+    'År',
+    'Måned',
+    'Avdelingsnummer',
+    'Prosjektnummer',
+    'Kontonummer',
+    'BeløpInn',
+    'BeløpUt',
+    'Beskrivelse'
+]
 
 def get_float(val):
     if type(val) == float or type(val) == int:
@@ -17,41 +46,34 @@ def get_float(val):
 def get_name_from_range(range: str) -> str:
     return re.compile(r"^'?(.+?)'?!.+").sub("\\1", range)
 
-def export_budget(spreadsheet_id, credentials_file, output_handle) -> str:
-    """Retrieve spreadsheet data and write CSV to output_handle.
-
-    Returns edit URL for spreadsheet.
-    """
-    credentials = Credentials.from_service_account_file(credentials_file)
-    service = build("sheets", "v4", credentials=credentials)
-
-    spreadsheet_info = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-
-    ranges = [
-        "'{}'!A1:I1000".format(sheet["properties"]["title"])
-        for sheet in spreadsheet_info["sheets"]
-    ]
-
-    result = service.spreadsheets().values().batchGet(
-        spreadsheetId=spreadsheet_id,
-        ranges=ranges,
-        valueRenderOption="UNFORMATTED_VALUE",
-    ).execute()
-
-    csv_out = csv.writer(output_handle, delimiter=';', quoting=csv.QUOTE_NONE)
-    csv_out.writerow([
-        'Type',
-        'Versjon',
-        'År',
-        'Måned',
-        'Avdelingsnummer',
-        'Prosjektnummer',
-        'Kontonummer',
-        'BeløpInn',
-        'BeløpUt',
-        'Beskrivelse'
-    ])
-
+def read_cache(path: str) -> dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def write_cache(path: str, cache: dict):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+def get_drive_version(credentials, spreadsheet_id) -> Optional[str]:
+    """Version of the spreadsheet file, increased by every change, or None if not available."""
+    try:
+        drive = build("drive", "v3", credentials=credentials)
+        return drive.files().get(fileId=spreadsheet_id, fields="version", supportsAllDrives=True).execute()["version"]
+    except Exception as e:
+        # Also transport, token refresh and socket errors. Without the
+        # version all sheets are downloaded and compared by hash instead.
+        logger.warning('Could not get version of budget spreadsheet: %s', e)
+        return None
+
+def sheet_hash(value_range: dict) -> str:
+    return hashlib.sha256(json.dumps(value_range.get("values", []), ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def convert_sheet(value_range: dict) -> list[list[Any]]:
+    """Budget rows of the values of one sheet."""
     COL_AAR = 0
     COL_SEMESTER = 1
     COL_AVDELING = 2
@@ -67,46 +89,165 @@ def export_budget(spreadsheet_id, credentials_file, output_handle) -> str:
             return ''
         return row[idx]
 
-    for value_range in result["valueRanges"]:
-        version = get_name_from_range(value_range['range'])
-
-        for row in value_range["values"][1:]:
-            # ignore rows without year
-            try:
-                aar = int(col(row, COL_AAR))
-            except ValueError:
-                continue
-
-            # ignore rows not including anything useful
-            if col(row, COL_INNTEKTER) == '' and col(row, COL_KOSTNADER) == '':
-                continue
-
-            csv_out.writerow([
-                col(row, COL_TYPE) or 'Budsjett',
-                version,
-                aar,
-                6 if col(row, COL_SEMESTER) == 'vår' else (12 if col(row, COL_SEMESTER) == 'høst' else 0),
-                col(row, COL_AVDELING),
-                col(row, COL_PROSJEKT),
-                col(row, COL_KONTO),
-                get_float(col(row, COL_INNTEKTER)) * -1,
-                get_float(col(row, COL_KOSTNADER)),
-                col(row, COL_KOMMENTAR)
-            ])
-
-    return spreadsheet_info["spreadsheetUrl"]
-
-def run(spreadsheet_id: str, credentials_file: str, reports_path: str):
-    if spreadsheet_id is None or credentials_file is None:
-        return 'Fetching data from budget is not configured - skipping budget'
+    version = get_name_from_range(value_range['range'])
+    rows = []
+
+    for row in value_range.get("values", [])[1:]:
+        # ignore rows without year
+        try:
+            aar = int(col(row, COL_AAR))
+        except ValueError:
+            continue
+
+        # ignore rows not including anything useful
+        if col(row, COL_INNTEKTER) == '' and col(row, COL_KOSTNADER) == '':
+            continue
+
+        rows.append([
+            col(row, COL_TYPE) or 'Budsjett',
+            version,
+            aar,
+            6 if col(row, COL_SEMESTER) == 'vår' else (12 if col(row, COL_SEMESTER) == 'høst' else 0),
+            col(row, COL_AVDELING),
+            col(row, COL_PROSJEKT),
+            col(row, COL_KONTO),
+            get_float(col(row, COL_INNTEKTER)) * -1,
+            get_float(col(row, COL_KOSTNADER)),
+            col(row, COL_KOMMENTAR)
+        ])
+
+    return rows
+
+def convert_sheets(value_ranges: list[dict], cached_sheets: dict) -> tuple[list[list[Any]], dict, int]:
+    """
+    Budget rows of all sheets, reusing the rows in cached_sheets of sheets
+    with the same values. Returns the rows, the new cache of the sheets and
+    the number of sheets that changed.
+    """
+    rows = []
+    sheets = {}
+    changed = 0
+    for value_range in value_ranges:
+        name = get_name_from_range(value_range['range'])
+        digest = sheet_hash(value_range)
+        cached = cached_sheets.get(name)
+        if cached is not None and cached['hash'] == digest:
+            sheet_rows = cached['rows']
+        else:
+            sheet_rows = convert_sheet(value_range)
+            changed += 1
+        sheets[name] = {'hash': digest, 'rows': sheet_rows}
+        rows.extend(sheet_rows)
+    return rows, sheets, changed
+
+def write_budget(rows: list[list[Any]], output_handle, columns: Optional[ReportColumns] = None):
+    csv_out = csv.writer(output_handle, delimiter=';', quoting=csv.QUOTE_NONE)
+    csv_out.writerow(BUDGET_HEADER)
+    for row in rows:
+        csv_out.writerow(row)
+        if columns is not None:
+            columns.writerow(row)
 
-    with open(reports_path + 'budget.txt', 'w') as f:
-        budget_edit_url = export_budget(spreadsheet_id, credentials_file, f)
+def fetch_budget(spreadsheet_id, credentials_file, cache_file: Optional[str] = None, metrics: Optional[Metrics] = None) -> tuple[list[list[Any]], str, int]:
+    """
+    Retrieve the budget rows of all sheets.
+
+    With cache_file, nothing is fetched if the Drive version of the
+    spreadsheet is the same as last time, and only changed sheets are
+    converted. Returns the rows, the edit URL for the spreadsheet and the
+    number of changed sheets.
+    """
+    credentials = Credentials.from_service_account_file(credentials_file)
+    cache = read_cache(cache_file) if cache_file is not None else {}
+
+    version = None
+    if cache_file is not None:
+        with maybe_span(metrics, 'sheets_request', call='version'):
+            version = get_drive_version(credentials, spreadsheet_id)
+        if version is not None and cache.get('version') == version and cache.get('spreadsheet_id') == spreadsheet_id:
+            return [row for sheet in cache['sheets'].values() for row in sheet['rows']], cache['url'], 0
+
+    service = build("sheets", "v4", credentials=credentials)
+
+    with maybe_span(metrics, 'sheets_request', call='get'):
+        spreadsheet_info = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+
+    ranges = [
+        "'{}'!A1:I1000".format(sheet["properties"]["title"])
+        for sheet in spreadsheet_info["sheets"]
+    ]
+
+    with maybe_span(metrics, 'sheets_request', call='batchGet'):
+        result = service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=ranges,
+            valueRenderOption="UNFORMATTED_VALUE",
+        ).execute()
 
-    with open(reports_path + 'budget_url.txt', 'w') as f:
-        f.write(budget_edit_url)
+    cached_sheets = cache.get('sheets', {}) if cache.get('spreadsheet_id') == spreadsheet_id else {}
+    rows, sheets, changed = convert_sheets(result["valueRanges"], cached_sheets)
 
-    return 'Fetched data from budget and updated report'
+    if cache_file is not None:
+        write_cache(cache_file, {
+            'spreadsheet_id': spreadsheet_id,
+            'version': version,
+            'url': spreadsheet_info["spreadsheetUrl"],
+            'sheets': sheets,
+        })
+
+    return rows, spreadsheet_info["spreadsheetUrl"], changed
+
+def export_budget(spreadsheet_id, credentials_file, output_handle, columns: Optional[ReportColumns] = None, metrics: Optional[Metrics] = None) -> str:
+    """Retrieve spreadsheet data and write CSV to output_handle.
+
+    The same rows are appended to columns if given, and the Sheets API
+    calls are timed into metrics.
+
+    Returns edit URL for spreadsheet.
+    """
+    rows, url, _ = fetch_budget(spreadsheet_id, credentials_file, metrics=metrics)
+    write_budget(rows, output_handle, columns=columns)
+    return url
+
+def write_if_changed(path: str, data: bytes) -> bool:
+    """Write data to path unless it already has it, keeping the mtime (and ETag) of unchanged reports."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
+
+def run(spreadsheet_id: str, credentials_file: str, reports_path: str, metrics: Optional[Metrics] = None, cache_path: Optional[str] = None):
+    """
+    Write the budget reports to reports_path, if changed. The cache of the
+    sheets is kept in cache_path, by default also reports_path.
+    """
+    if spreadsheet_id is None or credentials_file is None:
+        return 'Fetching data from budget is not configured - skipping budget'
+    if metrics is None:
+        metrics = Metrics()
+    if cache_path is None:
+        cache_path = reports_path
+
+    with metrics.span('refresh_stage', stage='fetch'):
+        rows, budget_edit_url, changed_sheets = fetch_budget(spreadsheet_id, credentials_file, cache_file=cache_path + BUDGET_CACHE, metrics=metrics)
+
+    with metrics.span('refresh_stage', stage='write'):
+        columns = ReportColumns(BUDGET_HEADER)
+        out = io.StringIO(newline='')
+        write_budget(rows, out, columns=columns)
+        changed = write_if_changed(reports_path + 'budget.txt', out.getvalue().encode('utf-8'))
+        changed = write_if_changed(reports_path + 'budget.cols', columns.to_bytes()) or changed
+        changed = write_if_changed(reports_path + 'budget_url.txt', budget_edit_url.encode('utf-8')) or changed
+    metrics.count('report_rows', len(columns), report='budget')
+
+    if not changed:
+        return 'Budget unchanged - kept the current report'
+    return 'Fetched data from budget and updated report (%d changed sheets)' % changed_sheets
 
 if __name__ == '__main__':
     print(run())
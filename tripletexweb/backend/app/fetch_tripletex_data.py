@@ -1,49 +1,69 @@
+import asyncio
 import datetime
+import glob
 import os
 import os.path
+import shutil
 import csv
+from typing import Callable, Iterable, Optional
 
-from tripletex.tripletex import Posting, PostingAggregate, TripletexConnectorV2, Tripletex
+from tripletex.ledger_store import LedgerStore, SyncResult, period_of
+from tripletex.metrics import Metrics
+from tripletex.session_token import default_cache_path
+from tripletex.tripletex import BASE_URL, Account, Department, Posting, PostingAggregate, Project, Tripletex, TripletexConnectorV2
+
+from report_columns import ReportColumns
 
 SEMESTERS = (
     {'id': 1, 'text': 'vår', 'start': '-01-01', 'end': '-06-30'},
     {'id': 2, 'text': 'høst', 'start': '-07-01', 'end': '-12-31'},
 )
 
-# We cache previous accounting data, and it will only be refetched
-# if we delete the aggregated-previous.txt file
-DATE_RANGES = {
-    'previous': ['2014-01-01', '2023-01-01'],
-    'current': ['2023-01-01', '2025-01-01'],
-}
+# The ledger is kept in a local store (ledger.sqlite) and synced
+# incrementally. Years before the previous year are considered closed and
+# are never refetched, unless the store is dropped with drop_cache.
+LEDGER_START = '2014-01-01'
 
+# Ledger is fetched in monthly windows by this many threads,
+# throttled to stay well below the Tripletex API rate limit.
+FETCH_WORKERS = 6
+FETCH_MAX_REQUESTS_PER_SECOND = 10
 
-def build_department_list(tripletex: Tripletex) -> str:
-    departments = tripletex.get_departments()
-    ret = ''
+
+def get_date_ranges(today: datetime.date) -> dict[str, list[str]]:
+    """Split the ledger into the closed ('previous') and open ('current') range."""
+    closed_before = datetime.date(today.year - 1, 1, 1)
+    if today.month == 12:
+        ledger_end = datetime.date(today.year + 1, 1, 1)
+    else:
+        ledger_end = datetime.date(today.year, today.month + 1, 1)
+
+    return {
+        'previous': [LEDGER_START, closed_before.isoformat()],
+        'current': [closed_before.isoformat(), ledger_end.isoformat()],
+    }
+
+
+def write_department_list(departments: list[Department], output_handle):
     for department in departments:
-        ret += '%s;%s;%s\n' % (
+        output_handle.write('%s;%s;%s\n' % (
             department.id,
             department.number,
             department.name,
-        )
-    return ret
+        ))
 
 
-def build_account_list(tripletex: Tripletex) -> str:
-    accounts = tripletex.get_accounts()
-    ret = ''
+def write_account_list(accounts: list[Account], output_handle):
     for account in accounts:
-        ret += '%s;%s;%s;%s\n' % (
+        output_handle.write('%s;%s;%s;%s\n' % (
             account.id,
             account.text,
             account.group,
             int(account.active)
-        )
-    return ret
+        ))
 
 
-def get_aggregated_data(tripletex: Tripletex, postings: list[Posting]) -> PostingAggregate:
+def get_aggregated_data(postings: Iterable[Posting]) -> PostingAggregate:
     def group_by_semester(row: Posting):
         sem = SEMESTERS[0 if row.date.month < 7 else 1]
         return (
@@ -75,35 +95,54 @@ def get_aggregated_data(tripletex: Tripletex, postings: list[Posting]) -> Postin
             row.account_name,
         )
 
-    return tripletex.aggregate_postings(postings, group_by_month, group_by_avdeling, group_by_project, group_by_account)
-
-
-def write_aggregated_data_report(data: PostingAggregate, output_handle, header=True):
+    # The callbacks are evaluated once per group of the given key columns.
+    levels = (
+        (('year', 'month'), group_by_month),
+        (('department_number',), group_by_avdeling),
+        (('project_id',), group_by_project),
+        (('account_number',), group_by_account),
+    )
+
+    try:
+        from tripletex.columnar import PostingColumns, aggregate_columns
+    except ImportError:
+        # numpy, from the "columnar" extra, is not installed.
+        return Tripletex.aggregate_postings(postings, *(aggregator for _, aggregator in levels))
+
+    return aggregate_columns(PostingColumns.from_postings(postings), *levels)
+
+
+AGGREGATED_HEADER = [
+    'Type',
+    'Versjon',
+    'År',
+    'Måned',
+    'Avdelingsnummer',
+    #'Avdelingsnavn',
+    'ProsjektId',
+    #'Prosjektnavn',
+    'Kontonummer',
+    #'Kontonavn',
+    'BeløpInn',
+    'BeløpUt'
+]
+
+
+def write_aggregated_data_report(data: PostingAggregate, output_handle, header=True, columns: Optional[ReportColumns] = None):
+    """Write the aggregate as CSV, and append the same rows to columns if given."""
     csv_out = csv.writer(output_handle, delimiter=';', quoting=csv.QUOTE_NONE)
+    version = datetime.date.today().strftime('%Y%m%d')
 
     if header:
-        csv_out.writerow([
-            'Type',
-            'Versjon',
-            'År',
-            'Måned',
-            'Avdelingsnummer',
-            #'Avdelingsnavn',
-            'ProsjektId',
-            #'Prosjektnavn',
-            'Kontonummer',
-            #'Kontonavn',
-            'BeløpInn',
-            'BeløpUt'
-        ])
+        csv_out.writerow(AGGREGATED_HEADER)
 
     for month in data.values():
         for avdeling_number, avdeling in month['data'].items():
             for project_id, project in avdeling['data'].items():
                 for account_number, account in project['data'].items():
-                    csv_out.writerow([
+                    row = [
                         'Regnskap',
-                        datetime.date.today().strftime('%Y%m%d'),
+                        version,
                         month['meta']['year'],
                         month['meta']['month'],
                         avdeling_number,
@@ -114,78 +153,167 @@ def write_aggregated_data_report(data: PostingAggregate, output_handle, header=T
                         #account['meta'],
                         account['data']['in'],
                         account['data']['out']
-                    ])
+                    ]
+                    csv_out.writerow(row)
+                    if columns is not None:
+                        columns.writerow(row)
 
 
-def build_project_list(tripletex: Tripletex) -> str:
-    ret = ''
-    projects = tripletex.get_projects()
+def write_project_list(projects: list[Project], output_handle):
     for project in projects:
-        ret += '%s;%s;%s;%s\n' % (project.id, project.parent if project.parent is not None else "", project.number, project.text)
-    return ret
+        output_handle.write('%s;%s;%s;%s\n' % (project.id, project.parent if project.parent is not None else "", project.number, project.text))
+
+
+def posting_decoder() -> str:
+    """msgspec if the "fast" extra is installed, else the json module."""
+    try:
+        import msgspec  # noqa: F401
+    except ImportError:
+        return 'json'
+    return 'msgspec'
+
+
+def fetch_all(context_id: int, store: LedgerStore, date_start: str, date_to: str, **connector_args) -> tuple[SyncResult, list[Department], list[Account], list[Project]]:
+    """
+    Sync the ledger and fetch the reference data. With httpx, from the
+    "async" extra, this is done concurrently over one connection pool,
+    otherwise one after the other with the sync client.
+    """
+    try:
+        from tripletex.async_tripletex import AsyncTripletex, AsyncTripletexConnector
+    except ImportError:
+        tripletex = Tripletex(context_id, connector=TripletexConnectorV2(**connector_args), decoder=posting_decoder())
+        return (
+            store.sync(tripletex, date_start=date_start, date_to=date_to, max_workers=FETCH_WORKERS),
+            tripletex.get_departments(),
+            tripletex.get_accounts(),
+            tripletex.get_projects(),
+        )
 
+    async def fetch():
+        async with AsyncTripletexConnector(**connector_args) as connector:
+            tripletex = AsyncTripletex(context_id, connector=connector, decoder=posting_decoder())
+            return await asyncio.gather(
+                store.sync_async(tripletex, date_start=date_start, date_to=date_to, max_workers=FETCH_WORKERS),
+                tripletex.get_departments(),
+                tripletex.get_accounts(),
+                tripletex.get_projects(),
+            )
+
+    return tuple(asyncio.run(fetch()))
 
-def run(context_id: int, customer_token: str, employee_token: str, reports_path: str, drop_cache=False):
-    ret = ''
-    fetch_postings = True
 
-    connector = TripletexConnectorV2(customer_token=customer_token, employee_token=employee_token)
-    tripletex = Tripletex(context_id, connector=connector)
+def run(context_id: int, customer_token: str, employee_token: str, reports_path: str, drop_cache=False, tripletex_base_url: Optional[str] = None, progress: Optional[Callable[[str], None]] = None, cache_path: Optional[str] = None, metrics: Optional[Metrics] = None):
+    """
+    Write the reports to reports_path. The ledger store and the aggregate of
+    the closed years are kept in cache_path, by default also reports_path.
+
+    The time of each stage, and of the Tripletex calls, is recorded in
+    metrics as refresh_stage spans, see tripletex.metrics.
+    """
+    ret = ''
+    if cache_path is None:
+        cache_path = reports_path
+    if metrics is None:
+        metrics = Metrics()
+
+    def log(message: str):
+        nonlocal ret
+        ret += message
+        if progress is not None:
+            progress(message.rstrip('\n'))
+
+    connector_args = dict(
+        customer_token=customer_token,
+        employee_token=employee_token,
+        pool_size=FETCH_WORKERS,
+        max_requests_per_second=FETCH_MAX_REQUESTS_PER_SECOND,
+        base_url=tripletex_base_url or BASE_URL,
+        # Shares session tokens between gunicorn workers and refreshes.
+        token_cache_path=default_cache_path(),
+        metrics=metrics,
+    )
 
     with open(reports_path + 'context_id.txt', 'w') as f:
         f.write(str(context_id))
 
-    # fetch postings
-    if fetch_postings:
-        prev_file = reports_path + 'aggregated-previous.txt'
-
-        # refetch previous data if missing
-        if not os.path.isfile(prev_file) or drop_cache:
-            postings = tripletex.get_postings(date_start=DATE_RANGES['previous'][0], date_to=DATE_RANGES['previous'][1], account_start=3000)
-            ret += 'Fetched postings for %s to %s (excl)\n' % (DATE_RANGES['previous'][0], DATE_RANGES['previous'][1])
-
-            prev_aggregated_data = get_aggregated_data(tripletex, postings)
-            with open(prev_file, 'w') as f:
-                write_aggregated_data_report(prev_aggregated_data, f)
-
-        else:
-            ret += 'To fetch older ledger add ?drop_cache to url\n'
-
-        # load previous data
-        prev = ''
-        with open(prev_file, 'r') as f:
-            prev = f.read()
-
-        # fetch current data
-        postings = tripletex.get_postings(date_start=DATE_RANGES['current'][0], date_to=DATE_RANGES['current'][1], account_start=3000)
-        ret += 'Fetched postings for %s to %s (excl)\n' % (DATE_RANGES['current'][0], DATE_RANGES['current'][1])
-
-        aggregated_data = get_aggregated_data(tripletex, postings)
-
-        with open(reports_path + 'aggregated.txt', 'w') as f:
-            # concatenate previous and current data
-            f.write(prev)
-            write_aggregated_data_report(aggregated_data, f, header=False)
-
-    # fetch raw list of departments
-    if True:
-        with open(reports_path + 'departments.txt', 'w') as f:
-            f.write(build_department_list(tripletex))
-        ret += 'Fetched department list\n'
-
-    # fetch raw list of accounts
-    if True:
-        with open(reports_path + 'accounts.txt', 'w') as f:
-            f.write(build_account_list(tripletex))
-        ret += 'Fetched account list\n'
-
-    # fetch raw list of projects
-    if True:
-        with open(reports_path + 'projects.txt', 'w') as f:
-            f.write(build_project_list(tripletex))
-        ret += 'Fetched project list\n'
-
-    ret += 'Reports saved to files in %s\n' % reports_path
+    date_ranges = get_date_ranges(datetime.date.today())
+    closed_before = date_ranges['current'][0]
+
+    with LedgerStore(cache_path + 'ledger.sqlite', account_start=3000, closed_before=closed_before) as store:
+        if drop_cache:
+            store.clear()
+
+        with metrics.span('refresh_stage', stage='fetch'):
+            sync, departments, accounts, projects = fetch_all(context_id, store, date_start=date_ranges['previous'][0], date_to=date_ranges['current'][1], **connector_args)
+
+        log('Synced ledger for %s to %s (excl): fetched %d months, %d unchanged, %d closed\n' % (
+            date_ranges['previous'][0],
+            date_ranges['current'][1],
+            len(sync.fetched),
+            len(sync.unchanged),
+            len(sync.closed),
+        ))
+
+        # The aggregate of the closed years is cached, and only rebuilt when
+        # the closed range moves or months in it had to be fetched.
+        prev_file = cache_path + 'aggregated-previous-%s.txt' % closed_before
+        prev_columns_file = cache_path + 'aggregated-previous-%s.cols' % closed_before
+        closed_fetched = any(period < period_of(closed_before) for period in sync.fetched)
+
+        if not os.path.isfile(prev_file) or not os.path.isfile(prev_columns_file) or closed_fetched:
+            with metrics.span('refresh_stage', stage='aggregate'):
+                postings = store.iter_postings(date_start=date_ranges['previous'][0], date_to=date_ranges['previous'][1])
+                prev_aggregated_data = get_aggregated_data(postings)
+            with metrics.span('refresh_stage', stage='write'):
+                prev_columns = ReportColumns(AGGREGATED_HEADER)
+                with open(prev_file, 'w') as f:
+                    write_aggregated_data_report(prev_aggregated_data, f, columns=prev_columns)
+                prev_columns.write(prev_columns_file)
+            log('Aggregated closed ledger for %s to %s (excl)\n' % (date_ranges['previous'][0], date_ranges['previous'][1]))
+
+        # remove older closed segments, and their compressed copies
+        for stale_file in glob.glob(cache_path + 'aggregated-previous*'):
+            if not stale_file.startswith((prev_file, prev_columns_file)):
+                os.remove(stale_file)
+
+        # aggregate current data
+        with metrics.span('refresh_stage', stage='aggregate'):
+            postings = store.iter_postings(date_start=date_ranges['current'][0], date_to=date_ranges['current'][1])
+            aggregated_data = get_aggregated_data(postings)
+
+    with metrics.span('refresh_stage', stage='write'):
+        # the same report in packed columns, see report_columns
+        columns = ReportColumns.read(prev_columns_file)
+
+        # concatenate previous and current data, copying the previous
+        # part in the kernel (sendfile) instead of reading it into memory
+        shutil.copyfile(prev_file, reports_path + 'aggregated.txt')
+        with open(reports_path + 'aggregated.txt', 'a') as f:
+            write_aggregated_data_report(aggregated_data, f, header=False, columns=columns)
+
+        columns.write(reports_path + 'aggregated.cols')
+        metrics.count('report_rows', len(columns), report='aggregated')
+
+        # raw list of departments
+        if True:
+            with open(reports_path + 'departments.txt', 'w') as f:
+                write_department_list(departments, f)
+            log('Fetched department list\n')
+
+        # raw list of accounts
+        if True:
+            with open(reports_path + 'accounts.txt', 'w') as f:
+                write_account_list(accounts, f)
+            log('Fetched account list\n')
+
+        # raw list of projects
+        if True:
+            with open(reports_path + 'projects.txt', 'w') as f:
+                write_project_list(projects, f)
+            log('Fetched project list\n')
+
+    log('Reports saved to files in %s\n' % reports_path)
     return ret
 
 if __name__ == '__main__':
@@ -0,0 +1,161 @@
+"""
+Background jobs for the refresh endpoints.
+
+Jobs run on a thread in the gunicorn worker that received the request, and
+their status is kept in JSON files in jobs_path, so any worker can report
+it. A job is deduplicated by its key: while a job with the same key is
+queued or running in a live process, enqueue returns its id instead of
+starting a new one.
+"""
+import datetime
+import fcntl
+import json
+import logging
+import os
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# A job's function is called with a callback for progress messages and
+# returns the final output, or a dict of the output and other values to
+# keep in the job status.
+JobFunction = Callable[[Callable[[str], None]], Union[str, dict]]
+
+# Status of finished jobs is kept this long.
+KEEP_JOBS = datetime.timedelta(days=7)
+
+
+def now() -> str:
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    def __init__(self, jobs_path: str, max_workers: int = 1):
+        self.jobs_path = jobs_path
+        os.makedirs(jobs_path, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+
+    def _job_file(self, job_id: str) -> str:
+        return os.path.join(self.jobs_path, 'job-%s.json' % job_id)
+
+    def _current_file(self, key: str) -> str:
+        return os.path.join(self.jobs_path, 'current-%s.txt' % key)
+
+    @contextmanager
+    def _lock(self):
+        with open(os.path.join(self.jobs_path, 'jobs.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write(self, job: dict):
+        # A unique temporary file, so no two writers ever share one.
+        path = self._job_file(job['id'])
+        tmp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(job, f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        try:
+            with open(self._job_file(job_id), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _active(self, key: str) -> Optional[dict]:
+        """The queued or running job for key, if its process is still alive."""
+        try:
+            with open(self._current_file(key), 'r') as f:
+                job = self.get(f.read().strip())
+        except FileNotFoundError:
+            return None
+
+        if job is None or job['status'] not in (QUEUED, RUNNING):
+            return None
+        if not pid_alive(job['pid']):
+            return None
+        return job
+
+    def _update(self, job_id: str, **values):
+        with self._lock():
+            job = self.get(job_id)
+            job.update(values)
+            self._write(job)
+
+    def _prune(self):
+        oldest = (datetime.datetime.now() - KEEP_JOBS).timestamp()
+        for name in os.listdir(self.jobs_path):
+            path = os.path.join(self.jobs_path, name)
+            if name.startswith('job-') and os.path.getmtime(path) < oldest:
+                os.remove(path)
+
+    def enqueue(self, key: str, title: str, func: JobFunction) -> str:
+        """Start func in the background, or return the id of the active job for key."""
+        with self._lock():
+            self._prune()
+            job = self._active(key)
+            if job is not None:
+                return job['id']
+
+            job = {
+                'id': uuid.uuid4().hex,
+                'key': key,
+                'title': title,
+                'status': QUEUED,
+                'pid': os.getpid(),
+                'created_at': now(),
+                'started_at': None,
+                'finished_at': None,
+                'progress': [],
+                'output': None,
+            }
+            self._write(job)
+            with open(self._current_file(key), 'w') as f:
+                f.write(job['id'])
+
+        self.executor.submit(self._run, job['id'], func)
+        return job['id']
+
+    def _run(self, job_id: str, func: JobFunction):
+        self._update(job_id, status=RUNNING, started_at=now())
+
+        def progress(message: str):
+            with self._lock():
+                job = self.get(job_id)
+                job['progress'].append(message)
+                self._write(job)
+
+        try:
+            output = func(progress)
+        except Exception:
+            logger.exception('Job %s failed', job_id)
+            self._update(job_id, status=FAILED, finished_at=now(), output=traceback.format_exc())
+        else:
+            values = output if isinstance(output, dict) else {'output': output}
+            self._update(job_id, status=DONE, finished_at=now(), **values)
@@ -0,0 +1,271 @@
+"""
+Indexed SQLite copy of the ledger reports, queried by /api/ledger.
+
+build() combines aggregated.cols, budget.cols and projects.txt into
+ledger.query.sqlite at the end of a refresh, and query() returns the sum
+of the cells matching some filters, grouped by the requested columns.
+
+The project tree is stored as a closure table (every ancestor/descendant
+pair), and the cells of each project's subtree are summed into the rollup
+table when building, so a parent project is looked up directly instead of
+being summed over its sub projects on every query.
+"""
+import os
+import sqlite3
+from typing import Any, Mapping, Optional
+
+from report_columns import ReportColumns
+
+DATABASE = 'ledger.query.sqlite'
+
+SCHEMA = """
+CREATE TABLE cell (
+    type TEXT NOT NULL,
+    version TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    period INTEGER NOT NULL,
+    department INTEGER NOT NULL,
+    project INTEGER NOT NULL,
+    account INTEGER NOT NULL,
+    amount_in REAL NOT NULL,
+    amount_out REAL NOT NULL
+);
+CREATE INDEX cell_period ON cell (period);
+CREATE INDEX cell_project ON cell (project, period);
+CREATE INDEX cell_account ON cell (account);
+
+CREATE TABLE project (
+    id INTEGER PRIMARY KEY,
+    parent INTEGER,
+    number INTEGER,
+    title TEXT
+);
+
+CREATE TABLE project_tree (
+    ancestor INTEGER NOT NULL,
+    descendant INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor, descendant)
+) WITHOUT ROWID;
+"""
+
+# Cells summed per subtree, filled after the cells are loaded.
+ROLLUP_SCHEMA = """
+CREATE TABLE rollup AS
+SELECT project_tree.ancestor AS project, type, version, year, month, period, department, account,
+    SUM(amount_in) AS amount_in, SUM(amount_out) AS amount_out, COUNT(*) AS count
+FROM cell JOIN project_tree ON cell.project = project_tree.descendant
+GROUP BY project_tree.ancestor, type, version, year, month, department, account;
+CREATE INDEX rollup_project ON rollup (project, period);
+"""
+
+# Columns of the cell table that can be grouped by.
+GROUP_COLUMNS = ('type', 'version', 'year', 'month', 'department', 'project', 'account')
+
+# Months in budget rows are 6 (spring), 12 (autumn) or 0 (whole year).
+REPORTS = (
+    ('aggregated.cols', 'ProsjektId'),
+    ('budget.cols', 'Prosjektnummer'),
+)
+
+
+def read_projects(reports_path: str) -> list[tuple[int, Optional[int], Optional[int], str]]:
+    """(id, parent, number, title) of the projects in projects.txt."""
+    projects = []
+    try:
+        with open(reports_path + 'projects.txt', 'r') as f:
+            for line in f:
+                cols = line.rstrip('\n').split(';')
+                if len(cols) < 3 or not cols[0]:
+                    continue
+                projects.append((
+                    int(cols[0]),
+                    int(cols[1]) if cols[1] else None,
+                    int(cols[2]) if cols[2] not in ('', 'None') else None,
+                    ';'.join(cols[3:]),
+                ))
+    except FileNotFoundError:
+        pass
+    return projects
+
+
+def project_tree(projects: list[tuple]) -> list[tuple[int, int, int]]:
+    """(ancestor, descendant, depth) for every project and each of its ancestors.
+
+    Cells without a project have project 0, which is only its own subtree.
+    """
+    parents = {project[0]: project[1] for project in projects}
+    tree = [(0, 0, 0)]
+    for id in parents:
+        ancestor, depth = id, 0
+        seen = set()
+        # Stop at missing parents and at loops in broken data.
+        while ancestor is not None and ancestor not in seen:
+            seen.add(ancestor)
+            tree.append((ancestor, id, depth))
+            ancestor, depth = parents.get(ancestor), depth + 1
+            if ancestor is not None and ancestor not in parents:
+                break
+    return tree
+
+
+def build(reports_path: str) -> int:
+    """Rebuild the query database from the reports, returning the number of cells."""
+    projects = read_projects(reports_path)
+    project_by_number = {number: id for id, _, number, _ in projects if number is not None}
+
+    path = reports_path + DATABASE
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.executescript(SCHEMA)
+        db.executemany('INSERT INTO project (id, parent, number, title) VALUES (?, ?, ?, ?)', projects)
+        db.executemany('INSERT OR IGNORE INTO project_tree VALUES (?, ?, ?)', project_tree(projects))
+
+        count = 0
+        for name, project_column in REPORTS:
+            if not os.path.isfile(reports_path + name):
+                continue
+            columns = ReportColumns.read(reports_path + name)
+            index = {column: i for i, column in enumerate(columns.header)}
+
+            def cells():
+                for row in columns.rows():
+                    project = row[index[project_column]]
+                    if project_column == 'Prosjektnummer':
+                        project = project_by_number.get(project, 0)
+                    yield (
+                        row[index['Type']],
+                        row[index['Versjon']],
+                        row[index['År']],
+                        row[index['Måned']],
+                        row[index['År']] * 100 + row[index['Måned']],
+                        row[index['Avdelingsnummer']],
+                        project,
+                        row[index['Kontonummer']],
+                        row[index['BeløpInn']],
+                        row[index['BeløpUt']],
+                    )
+
+            db.executemany('INSERT INTO cell VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', cells())
+            count += len(columns)
+
+        db.executescript(ROLLUP_SCHEMA)
+        db.commit()
+    finally:
+        db.close()
+
+    os.replace(tmp_path, path)
+    return count
+
+
+def parse_period(value: str) -> int:
+    """'2023' or '2023-05' as a period like 202305."""
+    parts = value.split('-')
+    if len(parts) == 1:
+        return int(parts[0]) * 100
+    if len(parts) == 2:
+        return int(parts[0]) * 100 + int(parts[1])
+    raise ValueError('Invalid period %s' % value)
+
+
+def query(reports_path: str, args: Mapping[str, Any]) -> dict:
+    """Sum the cells matching the filters in args.
+
+    Filters:
+      from, to: first and last period, as YYYY or YYYY-MM (to as YYYY
+        includes the whole year). Yearly budget rows (month 0) are
+        included for any month of their year.
+      type, version: only rows of this report type and version
+      department: department number, may be repeated
+      project: project id, including its sub projects unless subtree=0
+      account_from, account_to: account number range
+    group_by is a comma separated list of GROUP_COLUMNS.
+    """
+    getlist = args.getlist if hasattr(args, 'getlist') else lambda key: [args[key]] if key in args else []
+
+    group_by = [column for column in args.get('group_by', '').split(',') if column]
+    for column in group_by:
+        if column not in GROUP_COLUMNS:
+            raise ValueError('Cannot group by %s' % column)
+
+    where = []
+    params: list[Any] = []
+    table = 'cell'
+
+    if 'from' in args:
+        start = parse_period(args['from'])
+        # Yearly budget rows (month 0) belong to every month of the year.
+        where.append('(period >= ? OR period = ?)')
+        params.extend([start, start - start % 100])
+    if 'to' in args:
+        to = parse_period(args['to'])
+        where.append('period <= ?')
+        params.append(to + 99 if to % 100 == 0 else to)
+    for column in ('type', 'version'):
+        if column in args:
+            where.append('%s = ?' % column)
+            params.append(args[column])
+    departments = [int(value) for value in getlist('department')]
+    if departments:
+        where.append('department IN (%s)' % ', '.join('?' * len(departments)))
+        params.extend(departments)
+    if 'project' in args:
+        if args.get('subtree', '1') == '0':
+            where.append('project = ?')
+        elif 'project' in group_by:
+            # Broken down by sub project, so the cells are needed.
+            where.append('project IN (SELECT descendant FROM project_tree WHERE ancestor = ?)')
+        else:
+            table = 'rollup'
+            where.append('project = ?')
+        params.append(int(args['project']))
+    if 'account_from' in args:
+        where.append('account >= ?')
+        params.append(int(args['account_from']))
+    if 'account_to' in args:
+        where.append('account <= ?')
+        params.append(int(args['account_to']))
+
+    sql = 'SELECT %s FROM %s%s%s' % (
+        ', '.join(group_by + ['ROUND(SUM(amount_in), 2)', 'ROUND(SUM(amount_out), 2)', 'SUM(count)' if table == 'rollup' else 'COUNT(*)']),
+        table,
+        ' WHERE ' + ' AND '.join(where) if where else '',
+        ' GROUP BY %s ORDER BY %s' % (', '.join(group_by), ', '.join(group_by)) if group_by else '',
+    )
+
+    db = sqlite3.connect('file:%s?mode=ro' % (reports_path + DATABASE), uri=True)
+    try:
+        rows = db.execute(sql, params).fetchall()
+    finally:
+        db.close()
+
+    return {
+        'group_by': group_by,
+        'columns': group_by + ['in', 'out', 'count'],
+        'rows': [list(row) for row in rows if row[-1] > 0],
+    }
+
+
+def projects(reports_path: str) -> dict:
+    """The project tree, with the ids of the direct children and all descendants of each project."""
+    db = sqlite3.connect('file:%s?mode=ro' % (reports_path + DATABASE), uri=True)
+    try:
+        result = {
+            id: {'id': id, 'parent': parent, 'number': number, 'title': title, 'children': [], 'descendants': []}
+            for id, parent, number, title in db.execute('SELECT id, parent, number, title FROM project ORDER BY title')
+        }
+        for ancestor, descendant, depth in db.execute(
+                'SELECT ancestor, descendant, depth FROM project_tree WHERE depth > 0 ORDER BY depth, descendant'):
+            if ancestor in result:
+                result[ancestor]['descendants'].append(descendant)
+                if depth == 1:
+                    result[ancestor]['children'].append(descendant)
+    finally:
+        db.close()
+
+    return {'projects': list(result.values())}
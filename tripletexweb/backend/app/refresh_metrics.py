@@ -0,0 +1,93 @@
+"""
+Timings of the refresh jobs, for /metrics and the job status.
+
+Each job records into its own tripletex.metrics.Metrics, which is added to
+the totals for the job's key in metrics-<key>.json in the jobs directory,
+so /metrics gives the same answer from every gunicorn worker.
+"""
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from tripletex.metrics import Metrics, format_labels, format_prometheus
+
+PREFIX = 'okoreports_'
+
+
+def metrics_file(jobs_path: str, key: str) -> str:
+    return os.path.join(jobs_path, 'metrics-%s.json' % key)
+
+
+@contextmanager
+def locked(jobs_path: str):
+    with open(os.path.join(jobs_path, 'metrics.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read(jobs_path: str, key: str) -> Optional[dict]:
+    try:
+        with open(metrics_file(jobs_path, key), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def record(jobs_path: str, key: str, metrics: Metrics, succeeded: bool):
+    """Add the metrics of a finished job to the totals for key."""
+    with locked(jobs_path):
+        data = read(jobs_path, key) or {}
+        totals = Metrics.from_dict(data.get('totals', {}))
+        totals.merge(metrics)
+        totals.count('refresh_runs', status='done' if succeeded else 'failed')
+
+        data = {
+            'totals': totals.to_dict(),
+            'last_run': time.time(),
+            'last_duration': metrics.total_seconds('refresh'),
+            'last_succeeded': succeeded,
+        }
+        path = metrics_file(jobs_path, key)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+
+
+def render(jobs_path: str) -> str:
+    """The totals of all refreshes in the Prometheus text format."""
+    keys = sorted(
+        name[len('metrics-'):-len('.json')]
+        for name in os.listdir(jobs_path)
+        if name.startswith('metrics-') and name.endswith('.json')
+    )
+    sources = []
+    last_runs = []
+    for key in keys:
+        data = read(jobs_path, key)
+        if data is None:
+            continue
+        sources.append(({'refresh': key}, Metrics.from_dict(data['totals'])))
+        last_runs.append((key, data))
+
+    ret = format_prometheus(sources, prefix=PREFIX)
+    for name, field in (('refresh_last_run_timestamp_seconds', 'last_run'), ('refresh_last_duration_seconds', 'last_duration')):
+        ret += '# TYPE %s%s gauge\n' % (PREFIX, name)
+        for key, data in last_runs:
+            ret += '%s%s%s %s\n' % (PREFIX, name, format_labels({'refresh': key}), repr(float(data[field])))
+    return ret
+
+
+def stage_summary(metrics: Metrics) -> str:
+    """The time of each refresh stage, e.g. 'fetch 3.21 s, write 0.40 s'."""
+    stages = [
+        '%s %.2f s' % (span['labels']['stage'], span['sum'])
+        for span in metrics.to_dict()['spans']
+        if span['name'] == 'refresh_stage'
+    ]
+    return ', '.join(stages)
@@ -0,0 +1,168 @@
+"""
+Packed columnar version of the ledger reports (aggregated.txt, budget.txt).
+
+The same table as the CSV, stored per column so the frontend can read it
+into typed arrays without splitting lines (see decodeColumns in
+frontend/src/utils.js). Layout, all integers little-endian:
+
+    magic    4 bytes  b'OKOC'
+    version  uint32   1
+    rows     uint32   number of rows
+    length   uint32   length of the JSON header
+    header   JSON     {"columns": [{"name": ..., "type": ..., "values": [...]}]}
+
+followed by the data of each column, every part starting at a multiple of
+8 bytes. Columns of type "i32" are int32 arrays, "f64" float64 arrays and
+"dict" int32 codes into the strings in "values" (-1 is an empty string).
+"""
+import array
+import json
+import re
+import struct
+import sys
+from typing import Any, Iterable
+
+MAGIC = b'OKOC'
+VERSION = 1
+
+# Same typing of the CSV columns as parseLedger in the frontend.
+FLOAT_COLUMNS = ('BeløpInn', 'BeløpUt')
+INT_COLUMNS = ('Avdelingsnummer', 'Kontonummer', 'Prosjektnummer', 'ProsjektId', 'År', 'Måned')
+
+INT_PREFIX = re.compile(r'^\s*([+-]?\d+)')
+
+
+def to_int(value: Any) -> int:
+    """Like parseInt(value) || 0 in the frontend."""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = INT_PREFIX.match(str(value))
+    return int(match.group(1)) if match else 0
+
+
+def to_float(value: Any) -> float:
+    """Like parseFloat(value) || 0 in the frontend."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def padding(length: int) -> bytes:
+    return b'\0' * (-length % 8)
+
+
+class ReportColumns:
+    def __init__(self, header: list[str]):
+        self.header = list(header)
+        self.types = [
+            'f64' if name in FLOAT_COLUMNS else 'i32' if name in INT_COLUMNS else 'dict'
+            for name in self.header
+        ]
+        self.data = [array.array('d' if type == 'f64' else 'i') for type in self.types]
+        self.values: list[list[str]] = [[] for _ in self.header]
+        self._codes: list[dict[str, int]] = [{} for _ in self.header]
+
+    def __len__(self) -> int:
+        return len(self.data[0]) if self.data else 0
+
+    def writerow(self, row: list[Any]):
+        """Append a row, with the same values as written to the CSV."""
+        for i, type in enumerate(self.types):
+            value = row[i] if i < len(row) else ''
+            if type == 'f64':
+                self.data[i].append(to_float(value))
+            elif type == 'i32':
+                self.data[i].append(to_int(value))
+            else:
+                self.data[i].append(self._code(i, value))
+
+    def writerows(self, rows: Iterable[list[Any]]):
+        for row in rows:
+            self.writerow(row)
+
+    def _code(self, i: int, value: Any) -> int:
+        if value is None or value == '':
+            return -1
+        value = str(value)
+        code = self._codes[i].get(value)
+        if code is None:
+            code = len(self.values[i])
+            self._codes[i][value] = code
+            self.values[i].append(value)
+        return code
+
+    def rows(self) -> Iterable[list[Any]]:
+        for index in range(len(self)):
+            yield [
+                (self.values[i][data[index]] if data[index] != -1 else '') if type == 'dict' else data[index]
+                for i, (type, data) in enumerate(zip(self.types, self.data))
+            ]
+
+    def extend(self, other: 'ReportColumns'):
+        if other.header != self.header:
+            raise ValueError('Cannot combine reports with columns %s and %s' % (self.header, other.header))
+        self.writerows(other.rows())
+
+    def _parts(self) -> Iterable[bytes]:
+        columns = []
+        for name, type, values in zip(self.header, self.types, self.values):
+            column = {'name': name, 'type': type}
+            if type == 'dict':
+                column['values'] = values
+            columns.append(column)
+
+        header = json.dumps({'columns': columns}, ensure_ascii=False).encode('utf-8')
+        yield from (MAGIC, struct.pack('<III', VERSION, len(self), len(header)), header, padding(16 + len(header)))
+        for data in self.data:
+            if sys.byteorder == 'big':
+                data = array.array(data.typecode, data)
+                data.byteswap()
+            raw = data.tobytes()
+            yield raw
+            yield padding(len(raw))
+
+    def to_bytes(self) -> bytes:
+        return b''.join(self._parts())
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> 'ReportColumns':
+        if content[0:4] != MAGIC:
+            raise ValueError('Not a packed report')
+        version, rows, header_length = struct.unpack_from('<III', content, 4)
+        if version != VERSION:
+            raise ValueError('Unsupported packed report version %d' % version)
+
+        header = json.loads(content[16:16 + header_length].decode('utf-8'))
+        result = cls([column['name'] for column in header['columns']])
+
+        offset = 16 + header_length
+        offset += -offset % 8
+        for i, column in enumerate(header['columns']):
+            data = result.data[i]
+            data.frombytes(content[offset:offset + rows * data.itemsize])
+            if sys.byteorder == 'big':
+                data.byteswap()
+            offset += rows * data.itemsize
+            offset += -offset % 8
+
+            if column['type'] == 'dict':
+                result.values[i] = column['values']
+                result._codes[i] = {value: code for code, value in enumerate(column['values'])}
+
+        return result
+
+    def write(self, path: str):
+        # One column at a time, without joining the whole file in memory.
+        with open(path, 'wb') as f:
+            for part in self._parts():
+                f.write(part)
+
+    @classmethod
+    def read(cls, path: str) -> 'ReportColumns':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
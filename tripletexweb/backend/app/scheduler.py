@@ -0,0 +1,75 @@
+"""
+Periodic refresh, started in every gunicorn worker.
+
+Each worker wakes up at a jittered interval, but the time of the last run
+is kept in a file under an flock, so only one of them starts a refresh per
+interval.
+"""
+import datetime
+import fcntl
+import logging
+import os
+import random
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    def __init__(self, state_path: str, interval: datetime.timedelta, job: Callable[[], None], jitter: float = 0.1):
+        """
+        job is called at most once per interval across all processes
+        sharing state_path. Wake-ups are spread by +/- jitter of the interval.
+        """
+        self.state_path = state_path
+        self.interval = interval
+        self.job = job
+        self.jitter = jitter
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _next_delay(self) -> float:
+        return self.interval.total_seconds() * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _loop(self):
+        while not self._stop.wait(self._next_delay()):
+            try:
+                self.tick()
+            except Exception:
+                logger.exception('Scheduled refresh failed')
+
+    def _read_last_run(self) -> Optional[datetime.datetime]:
+        try:
+            with open(self.state_path, 'r') as f:
+                return datetime.datetime.fromisoformat(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def tick(self) -> bool:
+        """Run the job unless another process already did within the interval."""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                now = datetime.datetime.now()
+                last_run = self._read_last_run()
+                # Allow for the jitter of the other workers' wake-ups.
+                if last_run is not None and now - last_run < self.interval * (1 - self.jitter):
+                    return False
+
+                with open(self.state_path, 'w') as f:
+                    f.write(now.isoformat())
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        logger.info('Starting scheduled refresh')
+        self.job()
+        return True
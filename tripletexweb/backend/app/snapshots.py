@@ -0,0 +1,113 @@
+"""
+Versioned snapshots of the reports directory.
+
+A refresh writes its reports into a new directory under snapshots/, which
+starts as a copy of the current snapshot, and publishes it by pointing the
+current symlink at it with an atomic rename. Readers resolve the symlink
+once per request, so they always see one complete snapshot and never wait
+for a refresh. The last KEEP_SNAPSHOTS snapshots are kept, so a request
+that started on an older one can still finish.
+
+Builds are serialized with an flock, as the budget and accounting refreshes
+each replace only their own files and would otherwise drop the other's.
+"""
+import datetime
+import fcntl
+import fnmatch
+import logging
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOTS_DIR = 'snapshots'
+CURRENT = 'current'
+LOCK_FILE = 'snapshots.lock'
+
+KEEP_SNAPSHOTS = 3
+
+
+class Snapshots:
+    def __init__(self, reports_path: str, keep: int = KEEP_SNAPSHOTS, skip: tuple[str, ...] = ()):
+        """
+        Snapshots in reports_path. Before the first snapshot, the reports in
+        reports_path itself are current, and the first build starts from
+        them. Files matching the patterns in skip are not copied.
+        """
+        self.reports_path = reports_path
+        self.keep = keep
+        self.skip = skip
+        self.snapshots_path = os.path.join(reports_path, SNAPSHOTS_DIR)
+        self.current_link = os.path.join(reports_path, CURRENT)
+
+    def current_name(self) -> Optional[str]:
+        try:
+            return os.path.basename(os.readlink(self.current_link))
+        except FileNotFoundError:
+            return None
+
+    def current_path(self) -> str:
+        """Directory of the current snapshot, with a trailing slash."""
+        name = self.current_name()
+        if name is None:
+            return os.path.join(self.reports_path, '')
+        return os.path.join(self.snapshots_path, name, '')
+
+    @contextmanager
+    def _lock(self):
+        with open(os.path.join(self.reports_path, LOCK_FILE), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _copy_current(self, path: str):
+        source = self.current_path()
+        for name in os.listdir(source):
+            if name == LOCK_FILE or any(fnmatch.fnmatch(name, pattern) for pattern in self.skip) or not os.path.isfile(source + name):
+                continue
+            # copy2 keeps the mtime, which keeps the ETags of unchanged reports valid.
+            shutil.copy2(source + name, path + name)
+
+    def _next_number(self) -> int:
+        numbers = [int(name.split('-')[0]) for name in os.listdir(self.snapshots_path) if name.split('-')[0].isdigit()]
+        return max(numbers, default=0) + 1
+
+    @contextmanager
+    def build(self) -> Iterator[str]:
+        """
+        Yield the directory of a new snapshot, with a trailing slash, and
+        publish it when the block completes. It is removed on errors.
+        """
+        with self._lock():
+            os.makedirs(self.snapshots_path, exist_ok=True)
+            name = '%06d-%s' % (self._next_number(), datetime.datetime.now().strftime('%Y%m%dT%H%M%S'))
+            path = os.path.join(self.snapshots_path, name, '')
+            os.mkdir(path)
+
+            try:
+                self._copy_current(path)
+                yield path
+            except BaseException:
+                shutil.rmtree(path, ignore_errors=True)
+                raise
+
+            self._publish(name)
+            self._prune()
+
+    def _publish(self, name: str):
+        tmp_link = '%s.%s.tmp' % (self.current_link, uuid.uuid4().hex)
+        os.symlink(os.path.join(SNAPSHOTS_DIR, name), tmp_link)
+        os.replace(tmp_link, self.current_link)
+
+    def _prune(self):
+        current = self.current_name()
+        names = sorted(os.listdir(self.snapshots_path), reverse=True)
+        for name in names[self.keep:]:
+            if name != current:
+                logger.info('Removing old snapshot %s', name)
+                shutil.rmtree(os.path.join(self.snapshots_path, name), ignore_errors=True)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The pytest options and the fake server fixture are shared with the
+# tripletex benchmarks, which are not part of the installed package.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'tripletex', 'benchmarks'))
+
+from fake_server_fixtures import pytest_addoption, pytest_generate_tests, server  # noqa: E402, F401
@@ -0,0 +1,45 @@
+"""
+Benchmarks of a full refresh against FakeTripletexServer, run with:
+
+    cd tripletexweb/backend
+    python -m pytest benchmarks [--posting-counts 10000,100000] [--latency 0.05]
+"""
+import os
+
+import pytest
+
+from app import fetch_tripletex_data
+
+
+@pytest.fixture
+def reports_path(tmp_path):
+    return str(tmp_path) + '/'
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    # The rate limit would dominate the timings, and the fake server does
+    # not need protecting.
+    monkeypatch.setattr(fetch_tripletex_data, 'FETCH_MAX_REQUESTS_PER_SECOND', None)
+
+
+def refresh(server, reports_path, drop_cache=False):
+    return fetch_tripletex_data.run(
+        context_id=1,
+        customer_token='customer',
+        employee_token='employee',
+        reports_path=reports_path,
+        drop_cache=drop_cache,
+        tripletex_base_url=server.base_url,
+    )
+
+
+def test_refresh_cold(benchmark, server, reports_path):
+    benchmark.pedantic(refresh, args=(server, reports_path), kwargs={'drop_cache': True}, rounds=1)
+    assert os.path.getsize(reports_path + 'aggregated.txt') > 0
+
+
+def test_refresh_warm(benchmark, server, reports_path):
+    refresh(server, reports_path)
+    benchmark.pedantic(refresh, args=(server, reports_path), rounds=3)
+    assert os.path.getsize(reports_path + 'aggregated.txt') > 0
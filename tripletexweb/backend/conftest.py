@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules in app/ import each other as top-level modules, as they do
+# when app.py is run from that directory.
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
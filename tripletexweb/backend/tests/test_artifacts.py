@@ -0,0 +1,84 @@
+import gzip
+import os
+
+import pytest
+from flask import Flask
+
+from app import artifacts
+
+
+@pytest.fixture
+def reports_path(tmp_path):
+    with open(tmp_path / 'aggregated.txt', 'w') as f:
+        f.write('Type;Versjon\n' * 1000)
+    with open(tmp_path / 'ledger.sqlite', 'w') as f:
+        f.write('')
+    return str(tmp_path) + '/'
+
+
+@pytest.fixture
+def client(reports_path):
+    app = Flask(__name__)
+
+    @app.route('/reports/<path:path>')
+    def reports(path):
+        return artifacts.send_report(reports_path, path)
+
+    return app.test_client()
+
+
+class TestArtifacts:
+    def test_publish_reports(self, reports_path):
+        assert artifacts.publish_reports(reports_path) == 1
+        assert os.path.isfile(reports_path + 'aggregated.txt.gz')
+        assert not os.path.exists(reports_path + 'ledger.sqlite.gz')
+
+        # Unchanged reports are not written again.
+        assert artifacts.publish_reports(reports_path) == 0
+
+    def test_write_atomic(self, tmp_path):
+        path = str(tmp_path / 'aggregated.txt.etag')
+        # The temporary file of another writer is left alone.
+        with open(path + '.tmp', 'w') as f:
+            f.write('other')
+
+        artifacts.write_atomic(path, b'abc')
+
+        with open(path, 'rb') as f:
+            assert f.read() == b'abc'
+        assert sorted(os.listdir(tmp_path)) == ['aggregated.txt.etag', 'aggregated.txt.etag.tmp']
+
+    def test_negotiates_encoding(self, reports_path, client):
+        artifacts.publish_reports(reports_path)
+
+        response = client.get('/reports/aggregated.txt', headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert gzip.decompress(response.data) == b'Type;Versjon\n' * 1000
+
+        response = client.get('/reports/aggregated.txt')
+        assert 'Content-Encoding' not in response.headers
+        assert response.data == b'Type;Versjon\n' * 1000
+
+    def test_conditional_get(self, reports_path, client):
+        artifacts.publish_reports(reports_path)
+
+        response = client.get('/reports/aggregated.txt', headers={'Accept-Encoding': 'gzip'})
+        etag = response.headers['ETag']
+        assert not etag.startswith('W/')
+
+        response = client.get('/reports/aggregated.txt', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+    def test_changed_report_served_plain(self, reports_path, client):
+        artifacts.publish_reports(reports_path)
+        etag_mtime = os.path.getmtime(reports_path + 'aggregated.txt.etag')
+        with open(reports_path + 'aggregated.txt', 'w') as f:
+            f.write('new')
+        os.utime(reports_path + 'aggregated.txt', (etag_mtime + 1, etag_mtime + 1))
+
+        response = client.get('/reports/aggregated.txt', headers={'Accept-Encoding': 'gzip'})
+        assert response.data == b'new'
+        assert 'Content-Encoding' not in response.headers
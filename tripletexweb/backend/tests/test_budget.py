@@ -27,3 +27,36 @@ class TestBudget:
         assert fetch_budget_data.get_name_from_range("'Something'!A1:C3") == "Something"
         assert fetch_budget_data.get_name_from_range("Something!A1:C3") == "Something"
         assert fetch_budget_data.get_name_from_range("Something") == "Something"
+
+    def test_convert_sheets_reuses_unchanged(self):
+        sheets = [
+            {'range': "'B1'!A1:I1000", 'values': [['År'], [2023, 'vår', 1, 200, 3000, 100, '', 'Salg']]},
+            {'range': "'B2'!A1:I1000", 'values': [['År'], [2023, 'høst', 1, 200, 4000, '', '1 000,5']]},
+        ]
+        rows, cache, changed = fetch_budget_data.convert_sheets(sheets, {})
+        assert rows == [
+            ['Budsjett', 'B1', 2023, 6, 1, 200, 3000, -100, 0, 'Salg'],
+            ['Budsjett', 'B2', 2023, 12, 1, 200, 4000, 0, 1000.5, ''],
+        ]
+        assert changed == 2
+
+        sheets[1]['values'][1][6] = 10
+        cache['B1']['rows'] = [['cached']]
+        rows, _, changed = fetch_budget_data.convert_sheets(sheets, cache)
+        assert rows == [['cached'], ['Budsjett', 'B2', 2023, 12, 1, 200, 4000, 0, 10, '']]
+        assert changed == 1
+
+    def test_drive_version_falls_back(self, monkeypatch):
+        def build(*args, **kwargs):
+            raise OSError('Network is unreachable')
+
+        monkeypatch.setattr(fetch_budget_data, 'build', build)
+        assert fetch_budget_data.get_drive_version(None, 'id') is None
+
+    def test_write_if_changed(self, tmp_path):
+        path = str(tmp_path / 'budget.txt')
+        assert fetch_budget_data.write_if_changed(path, b'a')
+        os.utime(path, (0, 0))
+        assert not fetch_budget_data.write_if_changed(path, b'a')
+        assert os.path.getmtime(path) == 0
+        assert fetch_budget_data.write_if_changed(path, b'b')
@@ -0,0 +1,73 @@
+import csv
+import io
+import sys
+
+import pytest
+
+from tripletex.testing import FakeTripletexServer
+from tripletex.tripletex import Project
+
+from app import fetch_tripletex_data
+from app.report_columns import ReportColumns
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FakeTripletexServer.synthetic(2000, date_start='2022-01-01', date_to='2027-01-01') as server:
+        yield server
+
+
+def refresh(server, reports_path):
+    return fetch_tripletex_data.run(
+        context_id=1,
+        customer_token='customer',
+        employee_token='employee',
+        reports_path=reports_path,
+        tripletex_base_url=server.base_url,
+    )
+
+
+class TestFetchTripletexData:
+    def test_columns_match_csv(self, server, tmp_path, monkeypatch):
+        monkeypatch.setattr(fetch_tripletex_data, 'FETCH_MAX_REQUESTS_PER_SECOND', None)
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+        reports_path = str(tmp_path) + '/'
+
+        # The second run reuses the cached closed segment.
+        for _ in range(2):
+            refresh(server, reports_path)
+
+            with open(reports_path + 'aggregated.txt') as f:
+                rows = list(csv.reader(f, delimiter=';'))
+            columns = ReportColumns.read(reports_path + 'aggregated.cols')
+
+            assert columns.header == rows[0]
+            assert len(columns) == len(rows) - 1 > 0
+            for row, decoded in zip(rows[1:], columns.rows()):
+                assert [str(value) for value in decoded[0:2]] == row[0:2]
+                assert decoded[2:7] == [int(value or 0) for value in row[2:7]]
+                assert decoded[7:9] == [float(value) for value in row[7:9]]
+
+    def test_without_extras(self, server, tmp_path, monkeypatch):
+        monkeypatch.setattr(fetch_tripletex_data, 'FETCH_MAX_REQUESTS_PER_SECOND', None)
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+        (tmp_path / 'full').mkdir()
+        (tmp_path / 'plain').mkdir()
+
+        refresh(server, str(tmp_path / 'full') + '/')
+
+        # None in sys.modules makes the import raise ImportError.
+        for module in ('tripletex.async_tripletex', 'tripletex.columnar', 'msgspec'):
+            monkeypatch.setitem(sys.modules, module, None)
+        refresh(server, str(tmp_path / 'plain') + '/')
+
+        for name in ('aggregated.txt', 'departments.txt', 'accounts.txt', 'projects.txt'):
+            assert (tmp_path / 'plain' / name).read_text() == (tmp_path / 'full' / name).read_text()
+
+    def test_write_project_list(self):
+        f = io.StringIO()
+        fetch_tripletex_data.write_project_list([
+            Project(id=1, number=100, text='Hoved', start='2020-01-01', end=None, parent=None),
+            Project(id=2, number=200, text='Under', start='2020-01-01', end=None, parent=1),
+        ], f)
+        assert f.getvalue() == '1;;100;Hoved\n2;1;200;Under\n'
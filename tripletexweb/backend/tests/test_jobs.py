@@ -0,0 +1,71 @@
+import threading
+
+from app import jobs
+
+
+def wait(queue: jobs.JobQueue, job_id: str) -> dict:
+    queue.executor.shutdown(wait=True)
+    return queue.get(job_id)
+
+
+class TestJobQueue:
+    def test_runs_job(self, tmp_path):
+        queue = jobs.JobQueue(str(tmp_path))
+
+        def func(progress):
+            progress('step 1')
+            progress('step 2')
+            return 'done!'
+
+        job = wait(queue, queue.enqueue('accounting', 'Title', func))
+        assert job['status'] == jobs.DONE
+        assert job['progress'] == ['step 1', 'step 2']
+        assert job['output'] == 'done!'
+
+    def test_extra_values(self, tmp_path):
+        queue = jobs.JobQueue(str(tmp_path))
+        job = wait(queue, queue.enqueue('accounting', 'Title', lambda progress: {'output': 'done!', 'timings': {'spans': []}}))
+        assert job['output'] == 'done!'
+        assert job['timings'] == {'spans': []}
+
+    def test_deduplicates_active_job(self, tmp_path):
+        queue = jobs.JobQueue(str(tmp_path))
+        release = threading.Event()
+
+        def func(progress):
+            release.wait()
+            return ''
+
+        first = queue.enqueue('accounting', 'Title', func)
+        assert queue.enqueue('accounting', 'Title', func) == first
+        assert queue.enqueue('budget', 'Title', func) != first
+
+        release.set()
+        wait(queue, first)
+
+        # A finished job is not reused.
+        queue = jobs.JobQueue(str(tmp_path))
+        assert queue.enqueue('accounting', 'Title', func) != first
+        queue.executor.shutdown(wait=True)
+
+    def test_shared_between_queues(self, tmp_path):
+        # Separate queues stand in for separate gunicorn workers.
+        queue, other = jobs.JobQueue(str(tmp_path)), jobs.JobQueue(str(tmp_path))
+        release = threading.Event()
+
+        job_id = queue.enqueue('accounting', 'Title', lambda progress: release.wait() and '')
+        assert other.enqueue('accounting', 'Title', lambda progress: '') == job_id
+        assert other.get(job_id)['status'] in (jobs.QUEUED, jobs.RUNNING)
+
+        release.set()
+        assert wait(queue, job_id)['status'] == jobs.DONE
+
+    def test_failed_job(self, tmp_path):
+        queue = jobs.JobQueue(str(tmp_path))
+
+        def func(progress):
+            raise ValueError('broken')
+
+        job = wait(queue, queue.enqueue('accounting', 'Title', func))
+        assert job['status'] == jobs.FAILED
+        assert 'ValueError: broken' in job['output']
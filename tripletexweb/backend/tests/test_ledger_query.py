@@ -0,0 +1,96 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app import ledger_query
+from app.report_columns import ReportColumns
+
+AGGREGATED_HEADER = ['Type', 'Versjon', 'År', 'Måned', 'Avdelingsnummer', 'ProsjektId', 'Kontonummer', 'BeløpInn', 'BeløpUt']
+BUDGET_HEADER = ['Type', 'Versjon', 'År', 'Måned', 'Avdelingsnummer', 'Prosjektnummer', 'Kontonummer', 'BeløpInn', 'BeløpUt', 'Beskrivelse']
+
+
+@pytest.fixture
+def reports_path(tmp_path):
+    reports_path = str(tmp_path) + '/'
+
+    # Project 1 is the parent of 2, which is the parent of 3.
+    with open(reports_path + 'projects.txt', 'w') as f:
+        f.write('1;;100;Hoved\n2;1;200;Under\n3;2;300;Underunder\n4;;400;Annen\n')
+
+    aggregated = ReportColumns(AGGREGATED_HEADER)
+    aggregated.writerows([
+        ['Regnskap', 'v', 2023, 1, '1', '1', '3000', -100, 0],
+        ['Regnskap', 'v', 2023, 2, '1', '2', '3000', -50, 0],
+        ['Regnskap', 'v', 2023, 2, '2', '3', '4000', 0, 30],
+        ['Regnskap', 'v', 2023, 8, '2', '4', '4000', 0, 10],
+        ['Regnskap', 'v', 2022, 12, '', '', '5000', 0, 5],
+    ])
+    aggregated.write(reports_path + 'aggregated.cols')
+
+    budget = ReportColumns(BUDGET_HEADER)
+    budget.writerows([
+        ['Budsjett', 'B1', 2023, 6, '1', 200, '3000', -120, 0, ''],
+        ['Budsjett', 'B1', 2023, 0, '1', 400, '3000', -1000, 0, ''],
+    ])
+    budget.write(reports_path + 'budget.cols')
+
+    assert ledger_query.build(reports_path) == 7
+    return reports_path
+
+
+def query(reports_path, **args):
+    return ledger_query.query(reports_path, MultiDict(args))['rows']
+
+
+class TestLedgerQuery:
+    def test_group_by(self, reports_path):
+        assert query(reports_path, group_by='type,year', type='Regnskap') == [
+            ['Regnskap', 2022, 0.0, 5.0, 1],
+            ['Regnskap', 2023, -150.0, 40.0, 4],
+        ]
+
+    def test_period(self, reports_path):
+        assert query(reports_path, **{'from': '2023-02', 'to': '2023-06', 'type': 'Regnskap'}) == [[-50.0, 30.0, 2]]
+        assert query(reports_path, **{'from': '2023', 'to': '2023', 'type': 'Regnskap'}) == [[-150.0, 40.0, 4]]
+
+    def test_period_includes_yearly_budget(self, reports_path):
+        assert query(reports_path, **{'from': '2023-08', 'to': '2023-12', 'type': 'Budsjett'}) == [[-1000.0, 0.0, 1]]
+        assert query(reports_path, **{'from': '2023-03', 'to': '2023-06', 'type': 'Budsjett'}) == [[-1120.0, 0.0, 2]]
+        assert query(reports_path, **{'from': '2024-01', 'type': 'Budsjett'}) == []
+
+    def test_project_subtree(self, reports_path):
+        assert query(reports_path, project='2', type='Regnskap') == [[-50.0, 30.0, 2]]
+        assert query(reports_path, project='2', subtree='0', type='Regnskap') == [[-50.0, 0.0, 1]]
+        assert query(reports_path, project='1', group_by='project', type='Regnskap') == [
+            [1, -100.0, 0.0, 1],
+            [2, -50.0, 0.0, 1],
+            [3, 0.0, 30.0, 1],
+        ]
+
+    def test_project_rollup(self, reports_path):
+        assert query(reports_path, project='1', type='Regnskap', group_by='month') == [
+            [1, -100.0, 0.0, 1],
+            [2, -50.0, 30.0, 2],
+        ]
+        assert query(reports_path, project='0') == [[0.0, 5.0, 1]]
+
+    def test_project_tree(self):
+        tree = ledger_query.project_tree([(1, None, 100, ''), (2, 1, 200, ''), (3, 2, 300, ''), (4, 9, 400, '')])
+        assert sorted(tree) == [(0, 0, 0), (1, 1, 0), (1, 2, 1), (1, 3, 2), (2, 2, 0), (2, 3, 1), (3, 3, 0), (4, 4, 0)]
+
+    def test_projects(self, reports_path):
+        projects = {project['id']: project for project in ledger_query.projects(reports_path)['projects']}
+        assert projects[1]['children'] == [2]
+        assert projects[1]['descendants'] == [2, 3]
+        assert projects[3]['title'] == 'Underunder'
+        assert projects[4]['descendants'] == []
+
+    def test_project_number_in_budget(self, reports_path):
+        assert query(reports_path, type='Budsjett', group_by='project') == [[2, -120.0, 0.0, 1], [4, -1000.0, 0.0, 1]]
+
+    def test_departments_and_accounts(self, reports_path):
+        args = MultiDict([('department', '1'), ('department', '2'), ('account_from', '3500'), ('account_to', '4999')])
+        assert ledger_query.query(reports_path, args)['rows'] == [[0.0, 40.0, 2]]
+
+    def test_invalid_group_by(self, reports_path):
+        with pytest.raises(ValueError):
+            query(reports_path, group_by='amount_in')
@@ -0,0 +1,31 @@
+from tripletex.metrics import Metrics
+
+from app import refresh_metrics
+
+
+class TestRefreshMetrics:
+    def test_record_and_render(self, tmp_path):
+        jobs_path = str(tmp_path)
+        for seconds in (1.0, 2.0):
+            metrics = Metrics()
+            metrics.observe('refresh', seconds + 0.5)
+            metrics.observe('refresh_stage', seconds, stage='fetch')
+            metrics.count('report_rows', 10, report='aggregated')
+            refresh_metrics.record(jobs_path, 'accounting', metrics, succeeded=True)
+
+        text = refresh_metrics.render(jobs_path)
+        assert 'okoreports_refresh_stage_seconds_count{refresh="accounting",stage="fetch"} 2.0\n' in text
+        assert 'okoreports_refresh_stage_seconds_sum{refresh="accounting",stage="fetch"} 3.0\n' in text
+        assert 'okoreports_report_rows_total{refresh="accounting",report="aggregated"} 20.0\n' in text
+        assert 'okoreports_refresh_runs_total{refresh="accounting",status="done"} 2.0\n' in text
+        assert 'okoreports_refresh_last_duration_seconds{refresh="accounting"} 2.5\n' in text
+
+    def test_render_empty(self, tmp_path):
+        assert 'okoreports_refresh_last_run_timestamp_seconds' in refresh_metrics.render(str(tmp_path))
+
+    def test_stage_summary(self):
+        metrics = Metrics()
+        metrics.observe('refresh_stage', 1.234, stage='fetch')
+        metrics.observe('refresh_stage', 0.5, stage='write')
+        metrics.observe('tripletex_http_request', 0.1, endpoint='/project')
+        assert refresh_metrics.stage_summary(metrics) == 'fetch 1.23 s, write 0.50 s'
@@ -0,0 +1,43 @@
+import pytest
+
+from app.report_columns import ReportColumns, to_int
+
+HEADER = ['Type', 'Versjon', 'År', 'Måned', 'Avdelingsnummer', 'ProsjektId', 'Kontonummer', 'BeløpInn', 'BeløpUt']
+
+
+class TestReportColumns:
+    def test_round_trip(self):
+        columns = ReportColumns(HEADER)
+        columns.writerow(['Regnskap', '20240101', 2023, 1, '', '12', '3000', -100.5, 0])
+        columns.writerow(['Regnskap', '20240101', 2023, 2, '4', '', '4000', 0, 20.25])
+
+        decoded = ReportColumns.from_bytes(columns.to_bytes())
+        assert list(decoded.rows()) == [
+            ['Regnskap', '20240101', 2023, 1, 0, 12, 3000, -100.5, 0.0],
+            ['Regnskap', '20240101', 2023, 2, 4, 0, 4000, 0.0, 20.25],
+        ]
+        assert decoded.values[0] == ['Regnskap']
+
+    def test_aligned(self):
+        columns = ReportColumns(HEADER)
+        columns.writerow(['Regnskap', 'x', 2023, 1, '', '', '3000', 1, 2])
+        content = columns.to_bytes()
+        assert len(content) % 8 == 0
+
+    def test_extend(self):
+        first = ReportColumns(HEADER)
+        first.writerow(['Regnskap', 'a', 2022, 1, '', '', '3000', 1, 2])
+        second = ReportColumns(HEADER)
+        second.writerow(['Budsjett', 'b', 2023, 1, '', '', '3000', 3, 4])
+
+        first.extend(second)
+        assert [row[0] for row in first.rows()] == ['Regnskap', 'Budsjett']
+
+        with pytest.raises(ValueError):
+            first.extend(ReportColumns(['Type']))
+
+    def test_to_int_like_parse_int(self):
+        assert to_int('12abc') == 12
+        assert to_int('') == 0
+        assert to_int(None) == 0
+        assert to_int(7.9) == 7
@@ -0,0 +1,34 @@
+import datetime
+
+from app import scheduler
+
+
+class TestScheduler:
+    def test_single_run_per_interval(self, tmp_path):
+        runs = []
+        state_path = str(tmp_path / 'scheduler.txt')
+
+        # Separate schedulers stand in for separate gunicorn workers.
+        workers = [
+            scheduler.Scheduler(state_path, datetime.timedelta(minutes=10), job=lambda: runs.append(1))
+            for _ in range(2)
+        ]
+        assert workers[0].tick()
+        assert not workers[1].tick()
+        assert len(runs) == 1
+
+    def test_runs_again_after_interval(self, tmp_path):
+        runs = []
+        state_path = str(tmp_path / 'scheduler.txt')
+        worker = scheduler.Scheduler(state_path, datetime.timedelta(minutes=10), job=lambda: runs.append(1))
+
+        with open(state_path, 'w') as f:
+            f.write((datetime.datetime.now() - datetime.timedelta(minutes=9, seconds=30)).isoformat())
+        assert worker.tick()
+        assert len(runs) == 1
+
+    def test_jittered_delay(self, tmp_path):
+        worker = scheduler.Scheduler(str(tmp_path / 'scheduler.txt'), datetime.timedelta(minutes=10), job=lambda: None, jitter=0.1)
+        delays = [worker._next_delay() for _ in range(100)]
+        assert all(540 <= delay <= 660 for delay in delays)
+        assert len(set(delays)) > 1
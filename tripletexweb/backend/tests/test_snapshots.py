@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from app import snapshots
+
+
+def write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def read(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+class TestSnapshots:
+    def test_starts_from_reports_path(self, tmp_path):
+        reports_path = str(tmp_path) + '/'
+        write(reports_path + 'budget.txt', 'budget')
+        write(reports_path + 'ledger.sqlite', '')
+        store = snapshots.Snapshots(reports_path, skip=('*.sqlite',))
+        assert store.current_path() == reports_path
+
+        with store.build() as path:
+            write(path + 'aggregated.txt', 'aggregated')
+
+        assert store.current_path() == path
+        assert sorted(os.listdir(path)) == ['aggregated.txt', 'budget.txt']
+        assert read(reports_path + 'current/budget.txt') == 'budget'
+
+    def test_previous_snapshot_unchanged(self, tmp_path):
+        store = snapshots.Snapshots(str(tmp_path) + '/')
+        with store.build() as first:
+            write(first + 'aggregated.txt', 'v1')
+            write(first + 'budget.txt', 'budget')
+
+        with store.build() as second:
+            # Not visible until the build completes.
+            assert store.current_path() == first
+            write(second + 'aggregated.txt', 'v2')
+
+        assert read(first + 'aggregated.txt') == 'v1'
+        assert read(store.current_path() + 'aggregated.txt') == 'v2'
+        assert read(store.current_path() + 'budget.txt') == 'budget'
+
+    def test_failed_build_removed(self, tmp_path):
+        store = snapshots.Snapshots(str(tmp_path) + '/')
+        with store.build() as first:
+            write(first + 'aggregated.txt', 'v1')
+
+        with pytest.raises(RuntimeError):
+            with store.build() as failed:
+                write(failed + 'aggregated.txt', 'half')
+                raise RuntimeError('fetch failed')
+
+        assert not os.path.exists(failed)
+        assert store.current_path() == first
+
+    def test_keeps_last_snapshots(self, tmp_path):
+        store = snapshots.Snapshots(str(tmp_path) + '/', keep=2)
+        for _ in range(4):
+            with store.build():
+                pass
+
+        assert len(os.listdir(store.snapshots_path)) == 2
+        assert store.current_name() in os.listdir(store.snapshots_path)
@@ -44,31 +44,56 @@ class DataWrapper extends React.Component {
     budgetUrl: 'budget_url'
   }
 
+  // Reports also available in packed columns, which are faster to parse.
+  static columnReports = ['ledger', 'budget']
+
   constructor(props) {
     super(props)
 
     this.state = {}
 
     Object.keys(DataWrapper.reports).forEach(stateName => {
-      const reportUrl = getApiUrl(`reports/${DataWrapper.reports[stateName]}.txt`)
-      fetch(reportUrl, {
-        credentials: 'include'
-      })
-        .then(response => {
-          if (!response.ok) {
-            return ''
-          } else {
-            return response.text()
-          }
-        })
-        .then(responseText => {
-          this.setState({
-            [stateName]: responseText.trim()
-          })
+      const load = DataWrapper.columnReports.includes(stateName)
+        ? this.fetchColumns(DataWrapper.reports[stateName]).catch(() => this.fetchText(DataWrapper.reports[stateName]))
+        : this.fetchText(DataWrapper.reports[stateName])
+
+      load.then(data => {
+        this.setState({
+          [stateName]: data
         })
+      })
+    })
+  }
+
+  fetchReport(file) {
+    return fetch(getApiUrl(`reports/${file}`), {
+      credentials: 'include'
     })
   }
 
+  fetchText(report) {
+    return this.fetchReport(`${report}.txt`)
+      .then(response => {
+        if (!response.ok) {
+          return ''
+        } else {
+          return response.text()
+        }
+      })
+      .then(responseText => responseText.trim())
+  }
+
+  fetchColumns(report) {
+    return this.fetchReport(`${report}.cols`)
+      .then(response => {
+        if (!response.ok) {
+          throw new Error(`Could not load ${report}.cols`)
+        }
+        return response.arrayBuffer()
+      })
+      .then(utils.decodeColumns)
+  }
+
   renderLoading() {
     return (
       <span>Laster data...</span>
@@ -326,7 +351,7 @@ class ReportTableWrapper extends React.Component {
           <p>
             <a href={getApiUrl('api/fetch-accounting')}>Last ny data fra Tripletex</a>
             {' '}
-            (<a href={getApiUrl('api/fetch-accounting?drop_cache')}>oppdater også tall før 2023</a>)
+            (<a href={getApiUrl('api/fetch-accounting?drop_cache')}>hent hele regnskapet på nytt</a>)
           </p>
           <p>
             <a href={getApiUrl('api/fetch-budget')}>Last ny data fra budsjett</a>
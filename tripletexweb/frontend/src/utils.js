@@ -71,12 +71,50 @@ export function mapProjectIdsForBudget(projects, parsed_ledger) {
 }
 
 /**
- * Parse CSV of ledger into an associative array
+ * Decode a packed columnar report (see backend/app/report_columns.py)
+ *
+ * Returns the column names and typed arrays with the column data, without
+ * splitting the report into lines.
+ */
+export function decodeColumns(buffer) {
+  const view = new DataView(buffer)
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4))
+  if (magic !== 'OKOC' || view.getUint32(4, true) !== 1) {
+    throw new Error('Unsupported report format')
+  }
+
+  const rowCount = view.getUint32(8, true)
+  const headerLength = view.getUint32(12, true)
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 16, headerLength)))
+
+  // Every column starts at a multiple of 8 bytes.
+  const align = offset => Math.ceil(offset / 8) * 8
+  let offset = align(16 + headerLength)
+
+  const columns = header.columns.map(column => {
+    const data = column.type === 'f64'
+      ? new Float64Array(buffer, offset, rowCount)
+      : new Int32Array(buffer, offset, rowCount)
+    offset = align(offset + data.byteLength)
+    return { ...column, data }
+  })
+
+  return { rowCount, columns }
+}
+
+/**
+ * Parse ledger into an associative array
+ *
+ * The ledger is either CSV, or the result of decodeColumns.
  *
  * The second parameter determines if this data is from Tripletex,
  * as if we know this we can link to more details in Tripletex
  */
 export function parseLedger(ledger, isNotFromTripletex) {
+  if (typeof ledger !== 'string') {
+    return parseLedgerColumns(ledger, isNotFromTripletex)
+  }
+
   let first = true
   let headers = null
   let entries = []
@@ -110,6 +148,23 @@ export function parseLedger(ledger, isNotFromTripletex) {
   return entries
 }
 
+function parseLedgerColumns({ rowCount, columns }, isNotFromTripletex) {
+  const entries = new Array(rowCount)
+
+  for (let i = 0; i < rowCount; i++) {
+    const entry = {isTripletex: !isNotFromTripletex}
+    columns.forEach(column => {
+      const value = column.data[i]
+      entry[column.name] = column.type === 'dict'
+        ? (value === -1 ? '' : column.values[value])
+        : value
+    })
+    entries[i] = entry
+  }
+
+  return entries
+}
+
 /**
  * Parse CSV of accounts into an associative array
  */